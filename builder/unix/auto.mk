@@ -54,8 +54,19 @@ endif
 SOURCEGENTOOL := $(SOURCEGEN_DIR)/sg.py
 EVALTOOL := $(SOURCEGEN_DIR)/cobjectgen.py
 
+#
+# Set SOURCEGEN_SERVER to the socket of a running sgserver.py to
+# generate through the server instead of a fresh process per module.
+#
+# Set SOURCEGEN_JOBS to generate each module's files in parallel.
+#
+# Set SOURCEGEN_CACHE to a directory to skip files whose inputs have
+# not changed since they were last generated.
+#
+SOURCEGEN_FLAGS := $(if $(SOURCEGEN_SERVER),--client $(SOURCEGEN_SERVER)) $(if $(SOURCEGEN_JOBS),-j $(SOURCEGEN_JOBS)) $(if $(SOURCEGEN_CACHE),--cache $(SOURCEGEN_CACHE))
+
 $(AUTOMODULE)_autogen:
-	@$(SOURCEGENTOOL) -d $($(AUTOMODULE)_AUTO_DEFS) -i $($(AUTOMODULE)_AUTO_FILELIST)
+	@$(SOURCEGENTOOL) $(SOURCEGEN_FLAGS) -d $($(AUTOMODULE)_AUTO_DEFS) -i $($(AUTOMODULE)_AUTO_FILELIST)
 	$($(AUTOMODULE)_AUTO_POST)
 
 $(AUTOMODULE)_autoeval:
@@ -30,17 +30,35 @@
 ###############################################################################
 ifdef DEPENDMODULES
 
+#
+# Module resolution is done by a single run of tools/dependmodulesmk.py,
+# which writes the results into a makefile fragment:
+#
+#    - The module dependency closure (when BUILDER_MODULE_DATABASE is set)
+#    - The removal of DEPENDMODULES_REMOVE
+#    - Any missing $(MODULE).mk files
+#    - The uppercase module names
+#
+# The fragment records the inputs it was generated from and is only
+# regenerated when these inputs, the manifests, or the database change.
+# Builds where nothing changed do not start any processes here.
+#
+DEPENDMODULES_FRAGMENT ?= .dependmodules.mk
+CLEAN_TARGETS := $(CLEAN_TARGETS) $(DEPENDMODULES_FRAGMENT) .dependmodules.x.mk
+
 ifdef BUILDER_MODULE_DATABASE
 
 # Use the module database to find inter-module dependencies automatically.
-
-DEPENDMODULES := $(shell $(BUILDER)/tools/modtool.py --db $(BUILDER_MODULE_DATABASE) --dependmodules $(DEPENDMODULES))
-
+#
+# If BUILDER_MODULE_DATABASE_ROOT is set the database is kept up to date
+# with the .module files under it. Only changed files are reread.
+ifdef BUILDER_MODULE_DATABASE_ROOT
+MODTOOL_DB_REFRESH := $(shell $(BUILDER)/tools/modtool.py --db $(BUILDER_MODULE_DATABASE) --dbroot $(BUILDER_MODULE_DATABASE_ROOT) --refresh)
 endif
 
+DEPENDMODULES_FRAGMENT_DB := --db $(BUILDER_MODULE_DATABASE)
 
-# Process any explicit requested module removals
-DEPENDMODULES := $(filter-out $(DEPENDMODULES_REMOVE),$(DEPENDMODULES))
+endif
 
 #
 # You can specify a set of module directories and the manifest will be
@@ -49,7 +67,7 @@ DEPENDMODULES := $(filter-out $(DEPENDMODULES_REMOVE),$(DEPENDMODULES))
 # This allows you to combine multiple repositories and module locations.
 #
 ifdef MODULE_DIRS
-MAKE_MODULE_DIRS_MANIFESTS := $(foreach dir,$(MODULE_DIRS),$(shell test -f $(dir)/Manifest.mk || $(MAKE) -C $(dir) manifest))
+MAKE_MODULE_DIRS_MANIFESTS := $(foreach dir,$(MODULE_DIRS),$(if $(wildcard $(dir)/Manifest.mk),,$(shell $(MAKE) -C $(dir) manifest)))
 MODULEMANIFEST += $(foreach dir,$(MODULE_DIRS),$(dir)/Manifest.mk)
 endif
 
@@ -65,13 +83,38 @@ endif
 #
 include $(MODULEMANIFEST)
 
-#
-# Make sure the $(MODULE).mk file exists for all modules on which we are depending:
-#
-DEPEND_MODULES_MK := $(foreach mod,$(DEPENDMODULES),$(shell test -f $($(mod)_BASEDIR)/$(mod).mk || $(BUILDER)/tools/modulemakes.py --name $(mod) --root=$($(mod)_BASEDIR)))
+# Module base directories as set by the manifests. The module makefiles
+# may redefine them.
+DEPENDMODULES_FRAGMENT_BASEDIRS := $(foreach v,$(filter %_BASEDIR,$(.VARIABLES)),$(v:_BASEDIR=)=$($(v)))
+
+DEPENDMODULES_REQUESTED := $(strip $(DEPENDMODULES))
+DEPENDMODULES_FRAGMENT_KEY := $(strip $(DEPENDMODULES_REQUESTED) / $(DEPENDMODULES_REMOVE) / $(MODULEMANIFEST) / $(BUILDER_MODULE_DATABASE))
+
+# 'make clean' must not remake the fragment or the module makefiles just
+# to delete them again. Clean up after what the last build included.
+DEPENDMODULES_CLEAN_ONLY := $(if $(MAKECMDGOALS),$(if $(filter-out clean,$(MAKECMDGOALS)),,1))
+
+ifdef DEPENDMODULES_CLEAN_ONLY
+
+ifneq ($(wildcard $(DEPENDMODULES_FRAGMENT)),)
+include $(DEPENDMODULES_FRAGMENT)
+DEPENDMODULES := $(DEPENDMODULES_FRAGMENT_MODULES)
+include $(wildcard $(DEPENDMODULES_FRAGMENT_MAKEFILES))
+endif
+
+else
+
+-include $(DEPENDMODULES_FRAGMENT)
+
+$(DEPENDMODULES_FRAGMENT): $(MODULEMANIFEST) $(BUILDER_MODULE_DATABASE)
+	$(BUILDER)/tools/dependmodulesmk.py --output $@ --key '$(DEPENDMODULES_FRAGMENT_KEY)' $(DEPENDMODULES_FRAGMENT_DB) $(DEPENDMODULES_REQUESTED) --remove $(DEPENDMODULES_REMOVE) --basedirs $(DEPENDMODULES_FRAGMENT_BASEDIRS)
+
+ifeq ($(DEPENDMODULES_FRAGMENT_KEY),$(strip $(DEPENDMODULES_FRAGMENT_CACHED_KEY)))
+
+DEPENDMODULES := $(DEPENDMODULES_FRAGMENT_MODULES)
 
 # Include all $(MODULE).mk in DEPENDMODULES
-include $(foreach mod,$(DEPENDMODULES),$($(mod)_BASEDIR)/$(mod).mk)
+include $(DEPENDMODULES_FRAGMENT_MAKEFILES)
 
 #
 # Add all $(MODULE)_INCLUDES to $GLOBAL_INCLUDES.
@@ -87,7 +130,7 @@ GLOBAL_LINK_LIBS += $(foreach mod,$(DEPENDMODULES),$($(mod)_GLOBAL_LINK_LIBS))
 #
 # Provide uppercase versions of DEPENDMODULES for optional config processing
 #
-DEPENDMODULES_UPPER := $(foreach mod,$(DEPENDMODULES),$(shell echo $(mod) | tr [:lower:] [:upper:]))
+DEPENDMODULES_UPPER := $(DEPENDMODULES_FRAGMENT_UPPER)
 
 #
 # Generate all requested DEPENDMODULE types into the dependmodules.x header.
@@ -96,8 +139,24 @@ DEPENDMODULES_UPPER := $(foreach mod,$(DEPENDMODULES),$(shell echo $(mod) | tr [
 DEPENDMODULE_ENTRIES += $(foreach mod,$(DEPENDMODULES),build:$(mod))
 # Modules can specify the types of entries they export:
 DEPENDMODULE_ENTRIES += $(foreach mod,$(DEPENDMODULES),$($(mod)_DEPENDMODULE_ENTRIES))
-# Generate
-DEPENDMODULE_HEADER := $(shell $(BUILDER)/tools/wod.py dependmodules.x $(BUILDER)/tools/dependmodules.py $(DEPENDMODULE_ENTRIES))
+# Generate only when the entries have changed since the last build.
+-include .dependmodules.x.mk
+ifneq ($(strip $(DEPENDMODULE_ENTRIES)),$(strip $(DEPENDMODULE_HEADER_KEY)))
+DEPENDMODULE_HEADER := $(shell $(BUILDER)/tools/dependmodulesmk.py --header dependmodules.x --stamp .dependmodules.x.mk $(DEPENDMODULE_ENTRIES))
+else ifeq ($(wildcard dependmodules.x),)
+DEPENDMODULE_HEADER := $(shell $(BUILDER)/tools/dependmodulesmk.py --header dependmodules.x --stamp .dependmodules.x.mk $(DEPENDMODULE_ENTRIES))
+endif
 
-endif # DEPENDMODULES
+else
 
+# The fragment is missing or was generated from different inputs.
+# Make remakes it and restarts before anything else is read from it.
+$(DEPENDMODULES_FRAGMENT): __dependmodules_fragment_force
+.PHONY: __dependmodules_fragment_force
+__dependmodules_fragment_force:
+
+endif
+
+endif # DEPENDMODULES_CLEAN_ONLY
+
+endif # DEPENDMODULES
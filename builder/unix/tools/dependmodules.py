@@ -26,49 +26,53 @@
 import os
 import sys
 
-if len(sys.argv) == 1:
-    print "usage: %s MACRO:MODULE [MACRO:MODULE] [MACRO:MODULE] ..."
-    sys.exit(1);
 
-
-macros = {}
-
-#
-# Parse all macro:module parameters into the macros dict
-#
-for arg in sys.argv[1:]:
-    entry = arg.split(":")
-    if(len(entry) != 2):
-        raise Exception("bad arguments.")
-    if not entry[0] in macros:
-        macros[entry[0]] = []
-    macros[entry[0]].append(entry[1])
-
-
-# Print entries.
-print "/* Autogenerated Module Dependencies. */\n"
-
-for (macro, entries) in macros.iteritems():
-    m = "DEPENDMODULE_%s" % macro.upper()
-    print "#ifdef %s" % m
-    for mod in entries:
-        print "%s(%s)" % (m, mod)
-    print "#undef %s" % m
-    print "#endif /* %s */\n" %m
-
-# The special 'build' class also gets native compilation defines
-print "/* Preprocessor definitions for all modules included in this build. */"
-for mod in macros['build']:
-    print """
+def generate(entries):
+    """Returns the contents of dependmodules.x for the given
+    MACRO:MODULE entries."""
+
+    macros = {}
+
+    #
+    # Parse all macro:module parameters into the macros dict
+    #
+    for arg in entries:
+        entry = arg.split(":")
+        if(len(entry) != 2):
+            raise Exception("bad arguments.")
+        if not entry[0] in macros:
+            macros[entry[0]] = []
+        macros[entry[0]].append(entry[1])
+
+
+    # Print entries.
+    s = "/* Autogenerated Module Dependencies. */\n\n"
+
+    for (macro, entries) in macros.iteritems():
+        m = "DEPENDMODULE_%s" % macro.upper()
+        s += "#ifdef %s\n" % m
+        for mod in entries:
+            s += "%s(%s)\n" % (m, mod)
+        s += "#undef %s\n" % m
+        s += "#endif /* %s */\n\n" %m
+
+    # The special 'build' class also gets native compilation defines
+    s += "/* Preprocessor definitions for all modules included in this build. */\n"
+    for mod in macros.get('build', []):
+        s += """
 #ifndef DEPENDMODULE_INCLUDE_%(MODULE)s
 #define DEPENDMODULE_INCLUDE_%(MODULE)s
 #endif
-""" % dict(MODULE=mod.upper())
-
-
 
+""" % dict(MODULE=mod.upper())
 
+    return s
 
 
+if __name__ == "__main__":
 
+    if len(sys.argv) == 1:
+        print "usage: %s MACRO:MODULE [MACRO:MODULE] [MACRO:MODULE] ..."
+        sys.exit(1);
 
+    sys.stdout.write(generate(sys.argv[1:]))
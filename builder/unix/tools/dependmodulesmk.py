@@ -0,0 +1,130 @@
+#!/usr/bin/python2
+################################################################
+#
+#        Copyright 2013, Big Switch Networks, Inc.
+#
+# Licensed under the Eclipse Public License, Version 1.0 (the
+# "License"); you may not use this file except in compliance
+# with the License. You may obtain a copy of the License at
+#
+#        http://www.eclipse.org/legal/epl-v10.html
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific
+# language governing permissions and limitations under the
+# License.
+#
+################################################################
+
+###############################################################################
+#
+# Batch tool for dependmodules.mk
+#
+# Computes everything dependmodules.mk needs from its inputs in a
+# single process and writes it as a makefile fragment:
+#
+#    - The dependency closure of the requested modules (modtool.py)
+#    - The removal of DEPENDMODULES_REMOVE
+#    - Missing $(MODULE).mk files (modulemakes.py)
+#    - The upper-case module names
+#
+# The fragment is included by dependmodules.mk and only rebuilt when
+# the requested modules, the manifests, or the module database change.
+#
+# With --header, generates dependmodules.x (dependmodules.py) and a
+# stamp makefile recording the entries it was generated from.
+#
+###############################################################################
+import os
+import sys
+import logging
+import argparse
+
+import modtool
+import modulemakes
+import dependmodules
+from wod import write_on_diff
+
+
+def write_atomic(fname, data):
+    tmp = "%s.%d" % (fname, os.getpid())
+    with open(tmp, "w") as f:
+        f.write(data)
+    os.rename(tmp, fname)
+
+
+def fragment(ops, logger):
+    modules = ops.modules
+    if ops.db:
+        mm = modtool.ModuleTool(logger)
+        mm.dbread(ops.db)
+        modules = mm.dependmodules(modules)
+
+    remove = set(ops.remove)
+    modules = [ m for m in modules if m not in remove ]
+
+    basedirs = dict(b.split("=", 1) for b in ops.basedirs)
+
+    s = "# Autogenerated by dependmodulesmk.py. Do not edit.\n"
+    s += "DEPENDMODULES_FRAGMENT_CACHED_KEY := %s\n" % ops.key
+    s += "DEPENDMODULES_FRAGMENT_MODULES := %s\n" % " ".join(modules)
+    s += "DEPENDMODULES_FRAGMENT_UPPER := %s\n" % " ".join(m.upper()
+                                                          for m in modules)
+    makefiles = []
+    rules = ""
+    for m in modules:
+        if m not in basedirs:
+            raise AttributeError("module %s is not in the module manifest." % m)
+        mk = "%s/%s.mk" % (basedirs[m], m)
+        if not os.path.exists(mk):
+            modulemakes.generate(m, basedirs[m])
+        makefiles.append(mk)
+        # Regenerate the module makefile if it is removed later.
+        rules += "%s:\n\t$(BUILDER)/tools/modulemakes.py --name %s --root=%s\n" % (
+            mk, m, basedirs[m])
+
+    s += "DEPENDMODULES_FRAGMENT_MAKEFILES := %s\n\n" % " ".join(makefiles)
+    s += rules
+    write_atomic(ops.output, s)
+
+
+def header(ops):
+    entries = ops.modules
+    write_on_diff(ops.header, dependmodules.generate(entries), msg=False)
+    write_atomic(ops.stamp,
+                 "# Autogenerated by dependmodulesmk.py. Do not edit.\n"
+                 "DEPENDMODULE_HEADER_KEY := %s\n" % " ".join(entries))
+
+
+if __name__ == "__main__":
+
+    logging.basicConfig()
+    logger = logging.getLogger("dependmodulesmk")
+
+    ap = argparse.ArgumentParser("dependmodulesmk")
+    ap.add_argument("modules", nargs='*',
+                    help="Requested modules, or MACRO:MODULE entries with --header.")
+    ap.add_argument("--output", help="Makefile fragment to generate.")
+    ap.add_argument("--key", default="",
+                    help="Key recorded in the fragment. dependmodules.mk rebuilds the fragment when its key changes.")
+    ap.add_argument("--db", help="Resolve dependencies from the given module db.")
+    ap.add_argument("--remove", nargs='*', default=[],
+                    help="Modules to remove from the result.")
+    ap.add_argument("--basedirs", nargs='*', default=[],
+                    help="NAME=DIR base directories of all known modules.")
+    ap.add_argument("--header", help="Generate the given dependmodules.x header.")
+    ap.add_argument("--stamp", help="Stamp makefile written with --header.")
+    ops = ap.parse_args()
+
+    try:
+        if ops.header:
+            header(ops)
+        elif ops.output:
+            fragment(ops, logger)
+        else:
+            ap.error("either --output or --header is required.")
+    except AttributeError, e:
+        logger.error(e)
+        sys.exit(1)
@@ -26,9 +26,41 @@
 ###############################################################################
 import sys
 import os
-import datetime
 import re
 
+from wod import write_on_diff
+
+# regexp used to recognize module definitions
+moduleRE = re.compile(r'\s*MODULE\s*:=\s*(?P<modname>.*)')
+
+
+def makefile_module(fname):
+    """Returns the MODULE defined in the given Makefile, if any.
+    Reading stops at the first definition. Binary files are skipped."""
+    with open(fname, 'r') as f:
+        if '\0' in f.read(1024):
+            return None
+        f.seek(0)
+        for line in f:
+            m = moduleRE.match(line)
+            if m:
+                return m.group('modname')
+    return None
+
+
+def discover_modules(rootdir="."):
+    """Returns a dict of module name to module directory, relative
+    to rootdir, for every Makefile under rootdir defining a MODULE."""
+    modules = {}
+    for root, dirs, files in os.walk(rootdir):
+        if "Makefile" in files:
+            modname = makefile_module(os.path.join(root, "Makefile"))
+            if modname:
+                root = os.path.relpath(root, rootdir)
+                modules[modname] = root
+    return modules
+
+
 class ManifestBase(object):
     """ Base class for all module manifest generators. """
 
@@ -44,15 +76,13 @@ class ManifestBase(object):
     # Block comment end, if applicable
     commentStop=""
 
-    def __init__(self):
-        # Autogeneration timestamp.
-        self.now = datetime.datetime.now()
-        # regexp used to recognize module definitions
-        self.moduleRE = re.compile(r'\s*MODULE\s*:=\s*(?P<modname>.*)')
-
-    def generate(self, rootdir="."):
+    def generate(self, rootdir=".", modules=None):
+        """Generates the target from the modules under rootdir. The
+        result of a previous discover_modules() may be passed in."""
 
         os.chdir(rootdir)
+        if modules is None:
+            modules = discover_modules()
 
         s = ""
         s += self.commentStart
@@ -61,24 +91,14 @@ class ManifestBase(object):
 #
 # %(DESCRIPTION)s
 #
-# Autogenerated %(TIMESTAMP)s
+# Autogenerated by manifesttool.py. Do not edit.
 #
 ##############################################################################
-""" % dict(DESCRIPTION=self.desc, TIMESTAMP=self.now)
+""" % dict(DESCRIPTION=self.desc)
 
         s += self.commentStop
         s += self.initsection()
-        self.modules = {}
-        for root, dirs, files in os.walk('.'):
-            for file_ in files:
-                if file_ == "Makefile":
-                    fname = "%s/%s" % (root, file_)
-                    for line in open(fname, 'r'):
-                        m = self.moduleRE.match(line)
-                        if m:
-                            if root.startswith("./"):
-                                root = root.replace("./", "")
-                            self.modules[m.group('modname')] = root
+        self.modules = modules
 
         for modname, root in sorted(self.modules.items()):
             s += self.module(modname, root)
@@ -89,7 +109,9 @@ class ManifestBase(object):
         if self.target == "-" or self.target == "stdout":
             sys.stdout.write(s)
         else:
-            open(self.target, "w").write(s);
+            # Only write changes. The output no longer carries a
+            # timestamp, so an unchanged tree leaves it untouched.
+            write_on_diff(self.target, s, msg=False)
 
 
     def module(self, modname, root):
@@ -164,12 +186,15 @@ if __name__ == "__main__":
         targets = classes.keys()
 
     for name in targets:
-        if name in classes:
-            x = classes[name]()
-            x.generate()
-        else:
+        if name not in classes:
             raise Exception("%s is not a valid generation option." % name)
 
+    # All manifests are rendered from a single walk of the tree.
+    modules = discover_modules()
+    for name in targets:
+        x = classes[name]()
+        x.generate(modules=modules)
+
 
 
 
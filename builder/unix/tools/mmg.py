@@ -26,54 +26,195 @@
 import sys
 import os
 import datetime
+import fnmatch
+import hashlib
 import re
 import yaml
 
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None
+
 import logging
 
+from wod import write_on_diff
+
 logging.basicConfig()
 logger = logging.getLogger("MMC")
 
+# Directories which never contain modules.
+PRUNE_DIRS = [ '.git', '.svn', '.hg', 'CVS', 'build' ]
+
+makefileRE = re.compile(r'\s*MODULE\s*:=\s*(?P<modname>.*)')
+
+
+def _listdir(path):
+    """Returns the (files, dirs) in path. Symlinked directories are
+    listed as files so they are not descended into, as with os.walk."""
+    files = []
+    dirs = []
+    if scandir:
+        for entry in scandir(path):
+            if entry.is_dir(follow_symlinks=False):
+                dirs.append(entry.name)
+            else:
+                files.append(entry.name)
+    else:
+        for name in os.listdir(path):
+            p = os.path.join(path, name)
+            if os.path.isdir(p) and not os.path.islink(p):
+                dirs.append(name)
+            else:
+                files.append(name)
+    return (files, dirs)
+
+
+def _makefile_module(fname):
+    """Returns the MODULE declared in the given Makefile, if any."""
+    with open(fname) as f:
+        for line in f:
+            m = makefileRE.match(line)
+            if m:
+                return m.group('modname')
+    return None
+
+
+def _ignored(name, relpath, ignore):
+    for pattern in ignore:
+        if fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(relpath, pattern):
+            return True
+    return False
+
+
+def find_module_roots(top,
+                      include_yamls=True,
+                      include_makefiles=False,
+                      prune=PRUNE_DIRS,
+                      ignore=[],
+                      nested=False):
+    """Returns a list of (moduleName, root, fname) for every module
+    directory under top, in sorted walk order.
+
+    Directories named in prune, or matching one of the ignore globs
+    (by name or by path relative to top), are not descended into.
+    Unless nested is set, neither is a module root once it is found."""
+
+    found = []
+    stack = [ top ]
+    while stack:
+        path = stack.pop()
+        try:
+            (files, dirs) = _listdir(path)
+        except OSError, e:
+            logger.warn("%s: %s" % (path, e.strerror))
+            continue
+
+        moduleName = None
+        fname = None
+
+        if include_makefiles and "Makefile" in files:
+            fname = os.path.join(path, "Makefile")
+            moduleName = _makefile_module(fname)
+            if moduleName:
+                write_on_diff(os.path.join(path, ".module"),
+                              yaml.dump(dict(name=moduleName), default_flow_style=False),
+                              msg=False)
+
+        if moduleName is None and include_yamls and ".module" in files:
+            fname = os.path.join(path, ".module")
+            moduleName = yaml.load(open(fname))['name']
+
+        if moduleName:
+            found.append((moduleName, os.path.realpath(path), fname))
+            if not nested:
+                continue
+
+        rel = os.path.relpath(path, top)
+        for d in sorted(dirs, reverse=True):
+            if d in prune or _ignored(d, os.path.normpath(os.path.join(rel, d)), ignore):
+                continue
+            stack.append(os.path.join(path, d))
+
+    return found
+
+
 def generate_manifest_data(dirs=["."],
                            include_yamls=True,
                            include_makefiles=False,
-                           generate_missing_yaml=False):
+                           generate_missing_yaml=False,
+                           prune=PRUNE_DIRS,
+                           ignore=[],
+                           nested=False,
+                           jobs=None):
+    """Returns (modules, duplicates) for all modules under dirs.
+
+    Each entry in dirs may be a ':' separated list of directories.
+    The directories are walked concurrently with up to 'jobs' threads.
+    When a module is found more than once, the directory listed first
+    wins and the others are reported as duplicates."""
+
+    roots = [ os.path.abspath(d) for dirspec in dirs for d in dirspec.split(':') ]
+
+    def walk(top):
+        return find_module_roots(top, include_yamls, include_makefiles,
+                                 prune, ignore, nested)
+
+    if len(roots) > 1 and jobs != 1:
+        from multiprocessing.pool import ThreadPool
+        pool = ThreadPool(jobs or len(roots))
+        try:
+            results = pool.map(walk, roots)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        results = [ walk(r) for r in roots ]
 
     modules = {}
     duplicates = []
+    for found in results:
+        for (moduleName, root, fname) in found:
+            if moduleName in modules:
+                duplicates.append((moduleName, root, fname))
+            else:
+                modules[moduleName] = root
+
+    return (modules, duplicates)
 
-    makefileRE = re.compile(r'\s*MODULE\s*:=\s*(?P<modname>.*)')
 
-    for dirspec in dirs:
-        for dir_ in dirspec.split(':'):
-            for root, dirs, files in os.walk(os.path.abspath(dir_)):
-                for file_ in files:
+def fingerprint_file(target):
+    """Returns the fingerprint file kept next to the given manifest."""
+    (head, tail) = os.path.split(target)
+    return os.path.join(head, ".%s.fingerprint" % tail)
 
-                    moduleName = None
-                    fname = "%s/%s" % (root, file_)
 
-                    root = os.path.realpath(root)
+def fingerprint(modules):
+    """Returns a digest of the discovered module roots."""
+    h = hashlib.sha1()
+    for modname, root in sorted(modules.items()):
+        h.update("%s %s\n" % (modname, root))
+    return h.hexdigest()
 
-                    if include_makefiles and file_ == "Makefile":
-                        for line in open(fname):
-                                m = makefileRE.match(line)
-                                if m:
-                                    moduleName = m.group('modname')
-                                    y = os.path.join(root, ".module")
-                                    with open(y, "w") as f:
-                                        f.write(yaml.dump(dict(name=moduleName), default_flow_style=False))
 
-                    if include_yamls and file_ == ".module":
-                        data = yaml.load(open(fname))
-                        moduleName = data['name']
+def fingerprint_changed(target, modules):
+    """Returns True if the target is missing or was generated from
+    different modules."""
+    fname = fingerprint_file(target)
+    if not os.path.exists(target) or not os.path.exists(fname):
+        return True
+    with open(fname) as f:
+        return f.read() != fingerprint(modules) + "\n"
 
-                    if moduleName:
-                        if moduleName in modules:
-                            duplicates.append((moduleName, root, fname))
-                        else:
-                            modules[moduleName] = root
 
-        return (modules, duplicates)
+def write_fingerprint(target, modules):
+    """Records the fingerprint of modules for target. Call this only
+    once the target has been written."""
+    write_on_diff(fingerprint_file(target), fingerprint(modules) + "\n",
+                  msg=False)
 
 
 
@@ -130,8 +271,9 @@ class ManifestBase(object):
         if target == '-':
             print s
         else:
-            with open(target, "w") as f:
-                f.write(s)
+            # Leave the manifest untouched if nothing changed so make
+            # does not reevaluate everything that includes it.
+            write_on_diff(target, s, msg=False)
 
 
 class MakeManifest(ManifestBase):
@@ -159,13 +301,27 @@ if __name__ == "__main__":
     ap.add_argument("config", help="Yaml Configuration File.")
     ap.add_argument("root", help="Relative root directory.")
     ap.add_argument("--only-if-missing", action='store_true')
+    ap.add_argument("--ignore", nargs='+', default=[],
+                    help="Do not search directories matching these globs.")
+    ap.add_argument("--nested", action='store_true',
+                    help="Search for modules inside other modules.")
+    ap.add_argument("-j", "--jobs", type=int,
+                    help="Search at most N directories concurrently.", metavar='N')
     ops = ap.parse_args()
     config = yaml.load(open(ops.config))
     dirs = [ os.path.join(ops.root, d) for d in config['directories'] ]
     target = os.path.join(ops.root, config['manifest'])
+    ignore = config.get('ignore', []) + ops.ignore
     if not os.path.exists(target) or ops.only_if_missing is False:
-        data = generate_manifest_data(dirs)[0]
-        MakeManifest(data).generate_file(target)
+        data = generate_manifest_data(dirs, ignore=ignore,
+                                      nested=ops.nested or config.get('nested', False),
+                                      jobs=ops.jobs)[0]
+        if fingerprint_changed(target, data):
+            # A stale fingerprint must not outlive a failed write.
+            if os.path.exists(fingerprint_file(target)):
+                os.unlink(fingerprint_file(target))
+            MakeManifest(data).generate_file(target)
+            write_fingerprint(target, data)
     print target
 
 
@@ -8,17 +8,26 @@ import os
 import sys
 import yaml
 import json
+import heapq
+import hashlib
 import logging
 
+# Directories never searched for .module files.
+PRUNE_DIRS = [ '.git', '.svn', '.hg', 'CVS', 'build' ]
+
 
 class ModuleTool(object):
     def __init__(self, logger):
         self.modules = {}
         self.logger = logger
+        # Transitive dependencies of each module, computed on demand.
+        self.closures = {}
 
-    def __load_module(self, fname):
+    def __load_module(self, fname, data=None):
         try:
-            d = yaml.load(open(fname))
+            if data is None:
+                data = open(fname).read()
+            d = yaml.load(data)
         except:
             self.logger.exception()
 
@@ -33,23 +42,81 @@ class ModuleTool(object):
 
         d['dir'] = os.path.dirname(fname)
         self.modules[d['name']] = d
+        self.closures = {}
+        return d
 
     def load_modules(self, target):
         target = os.path.abspath(target)
         if os.path.isdir(target):
-            for (root, dirs, files) in os.walk(target):
-                for f in files:
-                    if f == ".module":
-                        self.__load_module(os.path.join(root, f))
+            for fname in self.find_modules(target):
+                self.__load_module(fname)
         elif os.path.isfile(target):
             self.__load_module(target)
 
+    def __forget_module(self, module):
+        if self.modules.get(module['name']) is module:
+            del self.modules[module['name']]
+
+    def find_modules(self, root, prune=PRUNE_DIRS):
+        """Yields the path of every .module file under root."""
+        for (dirpath, dirs, files) in os.walk(root):
+            dirs[:] = [ d for d in dirs if d not in prune ]
+            if ".module" in files:
+                yield os.path.join(dirpath, ".module")
+
+    def refresh_modules(self, root, prune=PRUNE_DIRS):
+        """Brings the loaded db up to date with the .module files under root.
+
+        Only files whose mtime or size changed are read, and only files
+        whose contents changed are parsed. Returns True if the db changed."""
+        root = os.path.abspath(root)
+        known = {}
+        changed = False
+        for (name, module) in self.modules.items():
+            if 'modfile' in module:
+                known[module['modfile']['path']] = module
+            else:
+                # Not created by a refresh. Rebuild it.
+                del self.modules[name]
+                changed = True
+
+        found = set()
+        for fname in self.find_modules(root, prune):
+            found.add(fname)
+            st = os.stat(fname)
+            module = known.get(fname)
+            if module and (module['modfile']['mtime'] == st.st_mtime and
+                           module['modfile']['size'] == st.st_size):
+                continue
+
+            data = open(fname).read()
+            sha1 = hashlib.sha1(data).hexdigest()
+            if module is None or module['modfile']['sha1'] != sha1:
+                if module:
+                    self.__forget_module(module)
+                module = self.__load_module(fname, data)
+            module['modfile'] = dict(path=fname, mtime=st.st_mtime,
+                                     size=st.st_size, sha1=sha1)
+            changed = True
+
+        for (fname, module) in known.iteritems():
+            if fname not in found:
+                self.__forget_module(module)
+                changed = True
+
+        self.closures = {}
+        return changed
+
     def dbread(self, j):
         self.modules = json.load(open(j))
+        self.closures = {}
 
     def dbwrite(self, j):
-        with open(j, "w") as f:
+        # Replace atomically so concurrent readers never see a partial db.
+        tmp = "%s.%d" % (j, os.getpid())
+        with open(tmp, "w") as f:
             f.write(json.dumps(self.modules, indent=2))
+        os.rename(tmp, j)
 
     def write_make_manifest(self, handle):
         for (mname, module) in sorted(self.modules.iteritems()):
@@ -62,25 +129,75 @@ class ModuleTool(object):
             with open(mk, "w") as f:
                 self.write_make_manifest(f)
 
+    def depends(self, module):
+        if module not in self.modules:
+            raise AttributeError("module %s does not exist." % module)
+        depends = self.modules[module].get('depends') or []
+        if type(depends) is not list:
+            depends = [ depends ]
+        return depends
+
+    def closure(self, module, path=None):
+        """Returns the set of all modules 'module' depends on."""
+        if module in self.closures:
+            return self.closures[module]
+
+        path = path or []
+        if module in path:
+            cycle = path[path.index(module):] + [ module ]
+            raise AttributeError("circular module dependency: %s" %
+                                 " -> ".join(cycle))
+
+        rv = set()
+        for dep in self.depends(module):
+            rv.add(dep)
+            rv |= self.closure(dep, path + [ module ])
+
+        self.closures[module] = rv
+        return rv
+
     def dependmodules(self, modules):
         #
         # Dependent modules can only be added to the end of the list.
         # The original order of the explicit modules must remain unchanged.
         #
-        # dp contains all of the dependent modules
-        dp = []
+        explicit = []
         for module in modules:
-            if module not in self.modules:
-                raise AttributeError("module %s does not exist." % module)
-            elif 'depends' in self.modules[module]:
-                dp += self.dependmodules(self.modules[module]['depends'])
-
-        # The input list and all resulting dependencies in original order
-        allmodules = modules + list(set(dp))
+            self.closure(module)
+            if module not in explicit:
+                explicit.append(module)
 
-        # This makes sure there are no duplicates between the original list
-        # the dependency list that was just added (while keeping the original order)
-        rv = sorted(set(allmodules),key=lambda x: allmodules.index(x))
+        #
+        # The dependencies follow in topological order (every module
+        # before the modules it depends on). Ties are broken by the order
+        # in which modules are first reached from the explicit list,
+        # so the result is stable.
+        #
+        order = {}
+        stack = list(reversed(explicit))
+        while stack:
+            module = stack.pop()
+            if module not in order:
+                order[module] = len(order)
+                stack.extend(reversed(self.depends(module)))
+
+        indegree = dict((module, 0) for module in order)
+        for module in order:
+            for dep in set(self.depends(module)):
+                indegree[dep] += 1
+
+        heap = [ (order[m], m) for (m, n) in indegree.iteritems() if n == 0 ]
+        heapq.heapify(heap)
+        rv = list(explicit)
+        explicit = set(explicit)
+        while heap:
+            (index, module) = heapq.heappop(heap)
+            if module not in explicit:
+                rv.append(module)
+            for dep in set(self.depends(module)):
+                indegree[dep] -= 1
+                if indegree[dep] == 0:
+                    heapq.heappush(heap, (order[dep], dep))
 
         return rv
 
@@ -90,10 +207,75 @@ class ModuleTool(object):
             print "%s : %s" % (module['name'], module.get('depends', None))
 
 
-    def foreach_module(self, cmd):
-        for (nname, module) in self.modules.iteritems():
-            import subprocess
-            subprocess.check_call(cmd % module, shell=True)
+    def levels(self):
+        """Groups all modules by dependency level. Modules in a level
+        only depend on modules in earlier levels."""
+        level = {}
+        for name in sorted(self.modules):
+            self.closure(name)
+            self.__level(name, level)
+
+        rv = []
+        for (name, n) in sorted(level.iteritems()):
+            while len(rv) <= n:
+                rv.append([])
+            rv[n].append(name)
+        return rv
+
+    def __level(self, name, level):
+        if name not in level:
+            deps = [ self.__level(d, level) for d in self.depends(name) ]
+            level[name] = 1 + max(deps) if deps else 0
+        return level[name]
+
+    def __run_module(self, cmd, module):
+        import subprocess
+        p = subprocess.Popen(cmd % module, shell=True,
+                             stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        output = p.communicate()[0]
+        return (module['name'], p.returncode, output)
+
+    def foreach_module(self, cmd, jobs=1, by_level=False):
+        if by_level:
+            groups = self.levels()
+        else:
+            groups = [ sorted(self.modules) ]
+
+        if jobs <= 1:
+            for group in groups:
+                for name in group:
+                    import subprocess
+                    subprocess.check_call(cmd % self.modules[name], shell=True)
+            return
+
+        #
+        # Commands run in a pool of workers. Each command's output is
+        # captured and written in one piece when it completes.
+        #
+        from multiprocessing.pool import ThreadPool
+        pool = ThreadPool(jobs)
+        failed = []
+        try:
+            for group in groups:
+                results = pool.imap_unordered(
+                    lambda name: self.__run_module(cmd, self.modules[name]),
+                    group)
+                for (name, rc, output) in results:
+                    sys.stdout.write(output)
+                    sys.stdout.flush()
+                    if rc != 0:
+                        self.logger.error("module %s: command failed with status %d" % (name, rc))
+                        failed.append(name)
+                if failed:
+                    # Later levels depend on the failed modules.
+                    break
+        finally:
+            pool.close()
+            pool.join()
+
+        if failed:
+            raise RuntimeError("command failed for modules: %s" %
+                               " ".join(sorted(failed)))
 
 if __name__ == '__main__':
     import argparse
@@ -104,20 +286,30 @@ if __name__ == '__main__':
 
     ap.add_argument("--db", help="Load module db from the given file.")
     ap.add_argument("--dbroot", help="Generate the db from the given root if the db file is missing. This will also write the data to the file for future use.")
+    ap.add_argument("--refresh", help="Incrementally update an existing db from --dbroot, rereading only the .module files which changed.", action='store_true')
     ap.add_argument("--load-dir", help="Load data from the given directory.")
     ap.add_argument("--make-manifest", help="Generate the module manifest makefile.")
     ap.add_argument("--dependmodules", help="Generate all required modules based on inter-module dependencies", nargs='+')
     ap.add_argument("--show-dependencies", help="Show module dependencies.", action='store_true')
     ap.add_argument("--force", help="Force regeneration of existing files.", action='store_true')
     ap.add_argument("--foreach-module", help="Run a script over each module.")
+    ap.add_argument("-j", "--jobs", help="Run --foreach-module commands in N parallel workers.", type=int, default=1, metavar='N')
+    ap.add_argument("--by-level", help="Run --foreach-module commands in dependency order, one dependency level at a time.", action='store_true')
 
     ops = ap.parse_args()
 
     mm = ModuleTool(logger)
 
     if ops.db:
-        if os.path.exists(ops.db):
+        if os.path.exists(ops.db) and ops.refresh and ops.dbroot:
+            mm.dbread(ops.db)
+            if mm.refresh_modules(ops.dbroot):
+                mm.dbwrite(ops.db)
+        elif os.path.exists(ops.db):
             mm.dbread(ops.db)
+        elif ops.refresh and ops.dbroot:
+            mm.refresh_modules(ops.dbroot)
+            mm.dbwrite(ops.db)
         else:
             if ops.dbroot:
                 mm.load_modules(ops.dbroot)
@@ -134,7 +326,11 @@ if __name__ == '__main__':
         mm.show_dependencies()
 
     if ops.dependmodules:
-        print " ".join(mm.dependmodules(ops.dependmodules))
+        try:
+            print " ".join(mm.dependmodules(ops.dependmodules))
+        except AttributeError, e:
+            logger.error(e)
+            sys.exit(1)
 
     if ops.make_manifest:
         if not os.path.exists(ops.make_manifest) or ops.force:
@@ -142,4 +338,8 @@ if __name__ == '__main__':
         print ops.make_manifest
 
     if ops.foreach_module:
-        mm.foreach_module(ops.foreach_module)
+        try:
+            mm.foreach_module(ops.foreach_module, ops.jobs, ops.by_level)
+        except (AttributeError, RuntimeError), e:
+            logger.error(e)
+            sys.exit(1)
@@ -29,43 +29,29 @@ import argparse
 import pprint
 import datetime
 
-ap = argparse.ArgumentParser(description="Modulemake");
+def generate(name, root=".", makefile=None):
+    """Generates the inclusive makefile for a module."""
 
-ap.add_argument("--root",
-                help="Root of the module directory. Also the location of the generated makefile.",
-                default=".")
+    if makefile is None:
+        makefile = name + ".mk"
 
-ap.add_argument("--name",
-                help="Name of the module. Used in the comments.",
-                required=True)
+    #
+    # Find all files named 'make.mk', '_make.mk', or '__make.mk'
+    #
+    patterns = [ 'make.mk', '_make.mk', '__make.mk' ]
+    found = {}
+    for p in patterns:
+        found[p] = []
 
-ap.add_argument("--makefile",
-                help="Name of the generated file makefile. Default is <name>.mk",
-                default=None)
+    for root_, dirs, files in os.walk(root):
+        for file_ in files:
+            if file_ in patterns:
+                found[file_].append(dict(root=root_,file=file_))
 
-
-ops = ap.parse_args();
-
-if ops.makefile is None:
-    ops.makefile = ops.name + ".mk"
-
-#
-# Find all files named 'make.mk', '_make.mk', or '__make.mk'
-#
-patterns = [ 'make.mk', '_make.mk', '__make.mk' ]
-found = {}
-for p in patterns:
-    found[p] = []
-
-for root, dirs, files in os.walk(ops.root):
-    for file_ in files:
-        if file_ in patterns:
-            found[file_].append(dict(root=root,file=file_))
-
-#
-# Generate the output file
-#
-s = """
+    #
+    # Generate the output file
+    #
+    s = """
 ###############################################################################
 #
 # Inclusive Makefile for the %(MODULE)s module.
@@ -74,23 +60,43 @@ s = """
 #
 ###############################################################################
 %(MODULE)s_BASEDIR := $(dir $(abspath $(lastword $(MAKEFILE_LIST))))
-""" % dict(MODULE=ops.name,TIMESTAMP=datetime.datetime.now())
+""" % dict(MODULE=name,TIMESTAMP=datetime.datetime.now())
 
-#
-# include files in the makefile in the same order listed in patterns
-#
-for p in patterns:
-    for f in found[p]:
-        root = os.path.abspath(f['root'])
-        root = root.replace(os.path.abspath(ops.root)+"/", "$(%s_BASEDIR)" % (ops.name))
-        root = root.replace(os.path.abspath(ops.root), "$(%s_BASEDIR)" % (ops.name))
-        name = f['file']
-        s += "include %s/%s\n" % (root, name)
+    #
+    # include files in the makefile in the same order listed in patterns
+    #
+    for p in patterns:
+        for f in found[p]:
+            froot = os.path.abspath(f['root'])
+            froot = froot.replace(os.path.abspath(root)+"/", "$(%s_BASEDIR)" % (name))
+            froot = froot.replace(os.path.abspath(root), "$(%s_BASEDIR)" % (name))
+            s += "include %s/%s\n" % (froot, f['file'])
 
-s += "\n"
+    s += "\n"
 
-#
-# Write makefile
-#
-open("%s/%s" % (os.path.abspath(ops.root), ops.makefile), "w").write(s)
+    #
+    # Write makefile
+    #
+    open("%s/%s" % (os.path.abspath(root), makefile), "w").write(s)
+
+
+if __name__ == "__main__":
+
+    ap = argparse.ArgumentParser(description="Modulemake");
+
+    ap.add_argument("--root",
+                    help="Root of the module directory. Also the location of the generated makefile.",
+                    default=".")
+
+    ap.add_argument("--name",
+                    help="Name of the module. Used in the comments.",
+                    required=True)
+
+    ap.add_argument("--makefile",
+                    help="Name of the generated file makefile. Default is <name>.mk",
+                    default=None)
+
+
+    ops = ap.parse_args();
 
+    generate(ops.name, ops.root, ops.makefile)
@@ -91,7 +91,14 @@ aim_error_desc(aim_error_t e)
 int
 aim_error_valid(aim_error_t e)
 {
-    return aim_map_si_i(NULL, e, aim_error_map, 0) ? 1 : 0;
+    static const unsigned char __aim_error_valid[] = {
+        1, 1, 1, 1,
+    };
+    int i = (int)(e) - (-3);
+    if(i < 0 || i > 3) {
+        return 0;
+    }
+    return __aim_error_valid[i];
 }
 
 
@@ -236,9 +243,28 @@ aim_map_si_t aim_log_flag_desc_map[] =
 const char*
 aim_log_flag_name(aim_log_flag_t e)
 {
-    const char* name;
-    if(aim_map_si_i(&name, e, aim_log_flag_map, 0)) {
-        return name;
+    static const char* const __aim_log_flag_names[] = {
+        "msg",
+        "fatal",
+        "error",
+        "warn",
+        "info",
+        "verbose",
+        "trace",
+        "internal",
+        "bug",
+        "ftrace",
+        "syslog_emerg",
+        "syslog_alert",
+        "syslog_crit",
+        "syslog_error",
+        "syslog_warn",
+        "syslog_notice",
+        "syslog_info",
+        "syslog_debug",
+    };
+    if((0 <= e) && (e <= AIM_LOG_FLAG_SYSLOG_DEBUG)) {
+        return __aim_log_flag_names[e];
     }
     else {
         return "-invalid value for enum type 'aim_log_flag'";
@@ -263,9 +289,28 @@ aim_log_flag_value(const char* str, aim_log_flag_t* e, int substr)
 const char*
 aim_log_flag_desc(aim_log_flag_t e)
 {
-    const char* name;
-    if(aim_map_si_i(&name, e, aim_log_flag_desc_map, 0)) {
-        return name;
+    static const char* const __aim_log_flag_descs[] = {
+        "None",
+        "None",
+        "None",
+        "None",
+        "None",
+        "None",
+        "None",
+        "None",
+        "None",
+        "None",
+        "None",
+        "None",
+        "None",
+        "None",
+        "None",
+        "None",
+        "None",
+        "None",
+    };
+    if((0 <= e) && (e <= AIM_LOG_FLAG_SYSLOG_DEBUG)) {
+        return __aim_log_flag_descs[e];
     }
     else {
         return "-invalid value for enum type 'aim_log_flag'";
@@ -358,9 +403,14 @@ aim_map_si_t aim_log_handler_option_desc_map[] =
 const char*
 aim_log_handler_option_name(aim_log_handler_option_t e)
 {
-    const char* name;
-    if(aim_map_si_i(&name, e, aim_log_handler_option_map, 0)) {
-        return name;
+    static const char* const __aim_log_handler_option_names[] = {
+        "to_dbglog",
+        "to_syslog",
+        "to_stdout",
+        "to_stderr",
+    };
+    if((0 <= e) && (e <= AIM_LOG_HANDLER_OPTION_TO_STDERR)) {
+        return __aim_log_handler_option_names[e];
     }
     else {
         return "-invalid value for enum type 'aim_log_handler_option'";
@@ -385,9 +435,14 @@ aim_log_handler_option_value(const char* str, aim_log_handler_option_t* e, int s
 const char*
 aim_log_handler_option_desc(aim_log_handler_option_t e)
 {
-    const char* name;
-    if(aim_map_si_i(&name, e, aim_log_handler_option_desc_map, 0)) {
-        return name;
+    static const char* const __aim_log_handler_option_descs[] = {
+        "None",
+        "None",
+        "None",
+        "None",
+    };
+    if((0 <= e) && (e <= AIM_LOG_HANDLER_OPTION_TO_STDERR)) {
+        return __aim_log_handler_option_descs[e];
     }
     else {
         return "-invalid value for enum type 'aim_log_handler_option'";
@@ -455,7 +510,14 @@ aim_log_option_desc(aim_log_option_t e)
 int
 aim_log_option_valid(aim_log_option_t e)
 {
-    return aim_map_si_i(NULL, e, aim_log_option_map, 0) ? 1 : 0;
+    static const unsigned char __aim_log_option_valid[] = {
+        1, 1, 1, 1,
+    };
+    int i = (int)(e) - (0);
+    if(i < 0 || i > 3) {
+        return 0;
+    }
+    return __aim_log_option_valid[i];
 }
 
 
@@ -43,17 +43,17 @@ class CAIMCommonLogMacroGenerator(CObjectGenerator):
     # Generation Methods
     #
     ############################################################
-    def Header(self):
+    def EmitHeader(self, out):
 
-        s = """
+        out.write("""
 /******************************************************************************
  *
  * Common Module Log Macros
  *
  *****************************************************************************/
-"""
+""")
         for f in self.flags:
-            s += """
+            out.write("""
 /** Log a module-level %(name)s */
 #define AIM_LOG_MOD_%(NAME)s(...) \\
     AIM_LOG_MOD_COMMON(%(NAME)s, __VA_ARGS__)
@@ -61,17 +61,17 @@ class CAIMCommonLogMacroGenerator(CObjectGenerator):
 #define AIM_LOG_MOD_RL_%(NAME)s(_rl, _time, ...)           \\
     AIM_LOG_MOD_RL_COMMON(%(NAME)s, _rl, _time, __VA_ARGS__)
 
-""" % dict(NAME=f.upper(), name=f.lower())
+""" % dict(NAME=f.upper(), name=f.lower()))
 
-        s += """
+        out.write("""
 /******************************************************************************
  *
  * Common Object Log Macros
  *
  *****************************************************************************/
-"""
+""")
         for f in self.flags:
-            s += """
+            out.write("""
 /** Log an object-level %(name)s */
 #define AIM_LOG_OBJ_%(NAME)s(_obj, ...) \\
     AIM_LOG_OBJ_COMMON(_obj, %(NAME)s, __VA_ARGS__)
@@ -79,40 +79,42 @@ class CAIMCommonLogMacroGenerator(CObjectGenerator):
 #define AIM_LOG_OBJ_RL_%(NAME)s(_obj, _rl, _time, ...) \\
     AIM_LOG_OBJ_RL_COMMON(_obj, %(NAME)s, _rl, _time, __VA_ARGS__)
 
-""" % dict(NAME=f.upper(), name=f.lower())
+""" % dict(NAME=f.upper(), name=f.lower()))
 
-        s += """
+        out.write("""
 /******************************************************************************
  *
  * Default Macro Mappings
  *
  *****************************************************************************/
 #ifdef AIM_LOG_OBJ_DEFAULT
-"""
+""")
         for f in self.flags:
-            s += """
+            out.write("""
 /** %(NAME)s -> OBJ_%(NAME)s */
 #define AIM_LOG_%(NAME)s AIM_LOG_OBJ_%(NAME)s
 /** RL_%(NAME)s -> OBJ_RL_%(NAME)s */
 #define AIM_LOG_RL_%(NAME)s AIM_LOG_OBJ_RL_%(NAME)s
 
-""" % dict(NAME=f.upper(), name=f.lower())
+""" % dict(NAME=f.upper(), name=f.lower()))
 
-        s += """
+        out.write("""
 #else
-"""
+""")
         for f in self.flags:
-            s += """
+            out.write("""
 /** %(NAME)s -> MOD_%(NAME)s */
 #define AIM_LOG_%(NAME)s AIM_LOG_MOD_%(NAME)s
 /** RL_%(NAME)s -> MOD_RL_%(NAME)s */
 #define AIM_LOG_RL_%(NAME)s AIM_LOG_MOD_RL_%(NAME)s
-""" % dict(NAME=f.upper(), name=f.lower())
+""" % dict(NAME=f.upper(), name=f.lower()))
 
-        s += """
+        out.write("""
 #endif
-"""
-        return s;
+""")
+
+    def Header(self):
+        return self.Emitted(self.EmitHeader)
 
 
 
@@ -132,79 +134,76 @@ class CAIMCustomLogMacroGenerator(CObjectGenerator):
     # Generation Methods
     #
     ############################################################
-    def Header(self):
-        s = ""
+    def EmitHeader(self, out):
 
-        s += """
+        out.write("""
 /******************************************************************************
  *
  * Custom Module Log Macros
  *
  *****************************************************************************/
-"""
+""")
         for f in self.flags:
-            s += """
+            out.write("""
 /** Log a module-level %(name)s */
 #define %(PREFIX)s_LOG_MOD_%(NAME)s(...) \\
     AIM_LOG_MOD_CUSTOM(%(FID)s, "%(NAME)s", __VA_ARGS__)
 /** Log a module-level %(name)s with ratelimiting */
 #define %(PREFIX)s_LOG_MOD_RL_%(NAME)s(_rl, _time, ...)           \\
     AIM_LOG_MOD_RL_CUSTOM(%(FID)s, "%(NAME)s", _rl, _time, __VA_ARGS__)
-""" % self._dict(f)
+""" % self._dict(f))
 
-        s += """
+        out.write("""
 /******************************************************************************
  *
  * Custom Object Log Macros
  *
  *****************************************************************************/
-"""
+""")
         for f in self.flags:
-            s += """
+            out.write("""
 /** Log an object-level %(name)s */
 #define %(PREFIX)s_LOG_OBJ_%(NAME)s(_obj, ...) \\
     AIM_LOG_OBJ_CUSTOM(_obj, %(FID)s, "%(NAME)s", __VA_ARGS__)
 /** Log an object-level %(name)s with ratelimiting */
 #define %(PREFIX)s_LOG_OBJ_RL_%(NAME)s(_obj, _rl, _time, ...) \\
     AIM_LOG_OBJ_RL_CUSTOM(_obj, %(FID)s, "%(NAME)s", _rl, _time, __VA_ARGS__)
-""" % self._dict(f)
+""" % self._dict(f))
 
-        s += """
+        out.write("""
 /******************************************************************************
  *
  * Default Macro Mappings
  *
  *****************************************************************************/
 #ifdef AIM_LOG_OBJ_DEFAULT
-"""
+""")
         for f in self.flags:
-            s += """
+            out.write("""
 /** %(NAME)s -> OBJ_%(NAME)s */
 #define %(PREFIX)s_LOG_%(NAME)s %(PREFIX)s_LOG_OBJ_%(NAME)s
 /** RL_%(NAME)s -> OBJ_RL_%(NAME)s */
 #define %(PREFIX)s_LOG_RL_%(NAME)s %(PREFIX)s_LOG_RL_OBJ_%(NAME)s
 
-""" % self._dict(f)
+""" % self._dict(f))
 
-        s += """
+        out.write("""
 #else
-"""
+""")
         for f in self.flags:
-            s += """
+            out.write("""
 /** %(NAME)s -> MOD_%(NAME)s */
 #define %(PREFIX)s_LOG_%(NAME)s %(PREFIX)s_LOG_MOD_%(NAME)s
 /** RL_%(NAME)s -> MOD_RL_%(NAME)s */
 #define %(PREFIX)s_LOG_RL_%(NAME)s %(PREFIX)s_LOG_MOD_RL_%(NAME)s
-""" % self._dict(f)
+""" % self._dict(f))
 
-        s += """
+        out.write("""
 #endif
-"""
+""")
 
-
-
-
-        return s;
+    def Header(self):
+        return self.Emitted(self.EmitHeader)
 
 
 
@@ -77,6 +77,28 @@ class CConfigDefLookupFunction(CFunctionGenerator):
         self.rv = "const char*"
         self.name = self.cobj.basename + "Lookup"
         self.args = [ ["const char*", 'setting'] ]
+
+        if self.cobj.SortedLookup():
+            # The table is sorted by name.
+            self.body = """    int lo = 0;
+    int hi = %d;
+    while(setting && lo <= hi) {
+        int mid = (lo + hi) / 2;
+        int c = %s(setting, %s[mid].name);
+        if(c == 0) {
+            return %s[mid].value;
+        }
+        if(c < 0) {
+            hi = mid - 1;
+        }
+        else {
+            lo = mid + 1;
+        }
+    }
+    return NULL;""" % (len(self.cobj.defs) - 1, self.f.GlobalStringCompare(),
+                       ctn, ctn)
+            return
+
         self.body = """    int i;
     for(i = 0; %s[i].name; i++) {
         if(!%s(%s[i].name, setting)) {
@@ -125,19 +147,39 @@ class CConfigDefsGenerator(CObjectGenerator):
         k = d.keys()[0]
         return CConfigDefGenerator(name=k, initargs=d[k])
 
+    def SortedLookup(self):
+        """ Determine whether the settings table is sorted by name """
+
+        #
+        # Specify 'lookup: sorted' to generate the settings table in
+        # name order with a binary search lookup and index macros.
+        #
+        lookup = getattr(self, 'lookup', 'linear')
+        if lookup not in [ 'linear', 'sorted' ]:
+            raise Exception("Unknown lookup '%s' for cdefs %s" % (lookup,
+                                                                  self.name))
+        return lookup == 'sorted'
+
+    def TableDefs(self):
+        """ Returns the definitions in settings table order """
+        if self.SortedLookup():
+            return sorted(self.defs, key=lambda d: d.keys()[0])
+        return self.defs
+
     ############################################################
     #
     # Generation Methods
     #
     ############################################################
-    def Define(self):
+    def EmitDefine(self, out):
 
-        s = ""
         for cdef in self.defs:
-            s += self.CDefConstruct(cdef).Define()
-            s += "\n"
-        s += "\n"
-        return s
+            out.write(self.CDefConstruct(cdef).Define())
+            out.write("\n")
+        out.write("\n")
+
+    def Define(self):
+        return self.Emitted(self.EmitDefine)
 
 
     def DefineStruct(self):
@@ -146,24 +188,31 @@ class CConfigDefsGenerator(CObjectGenerator):
     def ExternTable(self):
         return """/** Configuration settings table. */\n""" + self.struct.ExternTable(self.ConfigTableName())
 
-    def DefineTable(self):
+    def EmitDefineTable(self, out):
         stringname = "__%s_STRINGIFY_NAME" % self.basename
         stringval = "__%s_STRINGIFY_VALUE" % self.basename
 
-        s = ""
-        s += "#define %s(_x) #_x\n" % stringname
-        s += "#define %s(_x) %s(_x)\n" % (stringval, stringname)
-        s += ""
-        s += self.struct.DefineTable(self.ConfigTableName())
-        s += "{\n"
-        for cdef in self.defs:
-            s += self.CDefConstruct(cdef).TableEntry(stringname, stringval)
-        s += "    { NULL, NULL }\n"
-        s += "};\n"
-        s += "#undef %s\n" % stringval
-        s += "#undef %s\n" % stringname
+        out.write("#define %s(_x) #_x\n" % stringname)
+        out.write("#define %s(_x) %s(_x)\n" % (stringval, stringname))
+        out.write(self.struct.DefineTable(self.ConfigTableName()))
+        out.write("{\n")
+        for cdef in self.TableDefs():
+            out.write(self.CDefConstruct(cdef).TableEntry(stringname, stringval))
+        out.write("    { NULL, NULL }\n")
+        out.write("};\n")
+        out.write("#undef %s\n" % stringval)
+        out.write("#undef %s\n" % stringname)
 
-        return s
+    def DefineTable(self):
+        return self.Emitted(self.EmitDefineTable)
+
+    def EmitIndexMacros(self, out):
+        out.write("/** Settings table indexes. */\n")
+        for (index, cdef) in enumerate(self.TableDefs()):
+            out.write("#define %s_INDEX %d\n" % (cdef.keys()[0], index))
+
+    def IndexMacros(self):
+        return self.Emitted(self.EmitIndexMacros)
 
     def DefineLookup(self):
         return CConfigDefLookupFunction(cobj=self).Define()
@@ -177,26 +226,32 @@ class CConfigDefsGenerator(CObjectGenerator):
     def PrototypeShow(self):
         return CConfigDefShowFunction(cobj=self).Prototype()
 
-    def Header(self):
-        s = ""
+    def EmitHeader(self, out):
         if self.basename != "aim_config":
-            s += "#include <AIM/aim.h>\n"
-        s += self.Define() + "\n"
-        s += self.f.Comment("""All compile time options can be queried or displayed
-""")
-        s += self.DefineStruct() + "\n"
-        s += self.ExternTable() + "\n"
-        s += self.PrototypeLookup() + "\n"
-        s += self.PrototypeShow() + "\n"
-        return s
+            out.write("#include <AIM/aim.h>\n")
+        self.EmitDefine(out)
+        out.write("\n")
+        out.write(self.f.Comment("""All compile time options can be queried or displayed
+"""))
+        out.write(self.DefineStruct() + "\n")
+        out.write(self.ExternTable() + "\n")
+        if self.SortedLookup():
+            self.EmitIndexMacros(out)
+            out.write("\n")
+        out.write(self.PrototypeLookup() + "\n")
+        out.write(self.PrototypeShow() + "\n")
 
-    def Source(self):
-        s = ""
-        s += self.DefineTable() + "\n"
-        s += self.DefineLookup() + "\n"
-        s += self.DefineShow() + "\n"
+    def Header(self):
+        return self.Emitted(self.EmitHeader)
 
-        return s
+    def EmitSource(self, out):
+        self.EmitDefineTable(out)
+        out.write("\n")
+        out.write(self.DefineLookup() + "\n")
+        out.write(self.DefineShow() + "\n")
+
+    def Source(self):
+        return self.Emitted(self.EmitSource)
 
 ###############################################################################
 #
@@ -105,26 +105,29 @@ class CEnumUtilities(CObjectGenerator):
             mapstruct=self.mapstruct,
             static=True)
 
+    def EmitHeader(self, out):
+        out.write(self.mapstruct.Define())
+        out.write(self.findByValueHelper.Prototype())
+        out.write(self.findByNameHelper.Prototype())
+        out.write(self.descByValueHelper.Prototype())
+
     def Header(self):
-        s = ""
-        s += self.mapstruct.Define()
-        s += self.findByValueHelper.Prototype()
-        s += self.findByNameHelper.Prototype()
-        s += self.descByValueHelper.Prototype()
-        return s
+        return self.Emitted(self.EmitHeader)
+
+    def EmitSource(self, out):
+        out.write(self.findByValueHelper.Define())
+        out.write(self.findByNameHelper.Define())
+        out.write(self.descByValueHelper.Define())
 
     def Source(self):
-        s = ""
-        s += self.findByValueHelper.Define()
-        s += self.findByNameHelper.Define()
-        s += self.descByValueHelper.Define()
-        return s
+        return self.Emitted(self.EmitSource)
+
+    def EmitAll(self, out):
+        self.EmitHeader(out)
+        self.EmitSource(out)
 
     def All(self):
-        s = ""
-        s += self.Header()
-        s += self.Source()
-        return s
+        return self.Emitted(self.EmitAll)
 
 
 class CEnumValidMacro(CMacroGenerator):
@@ -134,14 +137,18 @@ class CEnumValidMacro(CMacroGenerator):
         self.args = [ '_e' ]
         self.comment = "/** validator */\n";
 
+    def Range(self, e):
+        """ Range check expression for linear enums """
+        lastMember = self.enum.members[-1].name
+        return "(0 <= %s) && (%s <= %s)" % (
+            e, e, self.f.EnumEntry(lastMember, self.enum.name))
+
     def Body(self):
 
         s = ""
         if self.enum.IsLinear():
             # Linear enums can be checked with a macro expression
-            lastMember = self.enum.members[-1].name
-            s += ("    ( (0 <= (_e)) && ((_e) <= %s))" %
-                 (self.f.EnumEntry(lastMember, self.enum.name)))
+            s += "    ( %s)" % self.Range('(_e)')
         else:
             # Nonlinear enums must be checked by lookup:
             s += ("    (%s)" %
@@ -150,6 +157,17 @@ class CEnumValidMacro(CMacroGenerator):
         return s
 
 
+class CEnumFlagsValidMacro(CMacroGenerator):
+
+    def Init(self):
+        self.name = self.enum.name + "_flags_valid"
+        self.args = [ '_f' ]
+        self.comment = "/** flags word validator */\n"
+
+    def Body(self):
+        return "    ( ((_f) & ~%s) == 0 )" % self.enum.FlagsMaskName()
+
+
 class CEnumValidatorFunction(CFunctionGenerator):
 
     def Init(self):
@@ -158,6 +176,17 @@ class CEnumValidatorFunction(CFunctionGenerator):
         self.name = self.f.FunctionName("%sValid" % (self.enum.name))
         self.args = [ [ self.enum.EnumType(), 'e' ] ]
 
+        strategy = self.enum.ValidatorStrategy()
+        if strategy == 'dense':
+            self.body = self.DenseBody()
+            return
+        if strategy == 'switch':
+            self.body = self.SwitchBody()
+            return
+        if strategy == 'bsearch':
+            self.body = self.BinarySearchBody()
+            return
+
         maptable = self.enum.MapTableName();
 
         self.body = """    return %s ? 1 : 0;""" % (
@@ -165,6 +194,64 @@ class CEnumValidatorFunction(CFunctionGenerator):
                                                   'e',
                                                   maptable, '0'))
 
+    def DenseBody(self):
+        values = set(v for v in self.enum.MemberValues())
+        (low, high) = (min(values), max(values))
+        table = "__%s_valid" % self.enum.name
+
+        s = "    static const unsigned char %s[] = {\n" % table
+        flags = [ "1" if v in values else "0" for v in range(low, high + 1) ]
+        for i in range(0, len(flags), 16):
+            s += "        %s,\n" % ", ".join(flags[i:i+16])
+        s += "    };\n"
+        s += """    int i = (int)(e) - (%d);
+    if(i < 0 || i > %d) {
+        return 0;
+    }
+    return %s[i];""" % (low, high - low, table)
+        return s
+
+    def SwitchBody(self):
+        s = "    switch(e) {\n"
+        seen = set()
+        for (member, value) in zip(self.enum.members, self.enum.MemberValues()):
+            if value is None:
+                value = member.value
+            if value in seen:
+                continue
+            seen.add(value)
+            s += "        case %s:\n" % self.f.EnumEntry(member.name,
+                                                      self.enum.name)
+        s += """            return 1;
+        default:
+            return 0;
+    }"""
+        return s
+
+    def BinarySearchBody(self):
+        values = sorted(set(self.enum.MemberValues()))
+        table = "__%s_values" % self.enum.name
+
+        s = "    static const int %s[] = {\n" % table
+        for i in range(0, len(values), 8):
+            s += "        %s,\n" % ", ".join(str(v) for v in values[i:i+8])
+        s += "    };\n"
+        s += """    int lo = 0;
+    int hi = %d;
+    while(lo <= hi) {
+        int mid = (lo + hi) / 2;
+        if(%s[mid] == (int)(e)) {
+            return 1;
+        }
+        if(%s[mid] < (int)(e)) {
+            lo = mid + 1;
+        }
+        else {
+            hi = mid - 1;
+        }
+    }
+    return 0;""" % (len(values) - 1, table, table)
+        return s
 
 
 
@@ -176,6 +263,14 @@ class CEnumNameFunction(CFunctionGenerator):
         self.name = self.f.FunctionName("%sName" % (self.enum.name))
         self.args = [ [ self.enum.EnumType(), 'e' ] ]
 
+        if self.enum.IsDense():
+            # Dense linear enums index their names directly.
+            self.body = self.enum.DenseLookupBody(
+                "__%s_names" % self.enum.name,
+                [ m.strname if m.strname else m.name
+                  for m in self.enum.members ])
+            return
+
         maptable = self.enum.MapTableName();
 
         self.body = """    const char* name;
@@ -199,6 +294,12 @@ class CEnumDescFunction(CFunctionGenerator):
         self.name = self.f.FunctionName("%sDesc" % (self.enum.name))
         self.args = [ [ self.enum.EnumType(), 'e' ] ]
 
+        if self.enum.IsDense():
+            self.body = self.enum.DenseLookupBody(
+                "__%s_descs" % self.enum.name,
+                [ m.desc for m in self.enum.members ])
+            return
+
         maptable = self.enum.DescMapTableName();
 
         self.body = """    const char* name;
@@ -214,6 +315,51 @@ class CEnumDescFunction(CFunctionGenerator):
             self.enum.name)
 
 
+class CEnumFlagsFormatFunction(CFunctionGenerator):
+    def Init(self):
+        self.comments = "/** Render a flags word as '|' separated names. */\n"
+        self.rv = 'int'
+        self.name = self.f.FunctionName("%sFlagsFormat" % (self.enum.name))
+        self.args = [ [ 'unsigned int', 'flags' ],
+                      [ 'char*', 'buf' ],
+                      [ 'int', 'size' ] ]
+
+        table = "__%s_bit_names" % self.enum.name
+        s = "    static const char* const %s[] = {\n" % table
+        for member in self.enum.members:
+            s += "        \"%s\",\n" % (member.strname if member.strname
+                                          else member.name)
+        s += "    };\n"
+        s += """    const char* s;
+    int bit;
+    int len = 0;
+
+    if(size <= 0) {
+        return 0;
+    }
+
+    /* Unknown bits are not rendered. */
+    flags = (flags & 0x%xU) >> %d;
+    for(bit = 0; flags; bit++, flags >>= 1) {
+        if(!(flags & 1)) {
+            continue;
+        }
+        if(len && len < size - 1) {
+            buf[len++] = '|';
+        }
+        for(s = %s[bit]; *s && len < size - 1; s++) {
+            buf[len++] = *s;
+        }
+    }
+    /* Drop a separator left without a name by truncation. */
+    if(len && buf[len-1] == '|') {
+        len--;
+    }
+    buf[len] = 0;
+    return len;""" % (self.enum.FlagsMask(), self.enum.FlagOffset(), table)
+        self.body = s
+
+
 class CEnumValueFunction(CFunctionGenerator):
     def Init(self):
         self.comments = "/** Enum values. */\n"
@@ -224,6 +370,11 @@ class CEnumValueFunction(CFunctionGenerator):
                       'int substr',
                       ]
 
+        if self.enum.SortedLookup():
+            # Binary search over a table sorted by name.
+            self.body = self.SortedBody()
+            return
+
         maptable = self.enum.MapTableName();
 
         self.body = """    int i;
@@ -240,6 +391,38 @@ class CEnumValueFunction(CFunctionGenerator):
                                                  'str',
                                                  maptable, '0'))
 
+    def SortedBody(self):
+        table = "__%s_sorted" % self.enum.name
+        entries = sorted((m.strname if m.strname else m.name, m.name)
+                         for m in self.enum.members)
+
+        s = "    static const struct { const char* s; int i; } %s[] = {\n" % table
+        for (string, name) in entries:
+            s += """        { "%s", %s },\n""" % (
+                string, self.f.EnumEntry(name, self.enum.name))
+        s += "    };\n"
+        s += """    int lo = 0;
+    int hi = %d;
+    AIM_REFERENCE(substr);
+    while(str && lo <= hi) {
+        int mid = (lo + hi) / 2;
+        int c = %s(str, %s[mid].s);
+        if(c == 0) {
+            /* Enum Found */
+            *e = %s[mid].i;
+            return 0;
+        }
+        if(c < 0) {
+            hi = mid - 1;
+        }
+        else {
+            lo = mid + 1;
+        }
+    }
+    return -1;""" % (len(entries) - 1, self.f.GlobalStringCompare(),
+                     table, table)
+        return s
+
 
 
 import pprint
@@ -256,11 +439,14 @@ class CEnumGenerator(CObjectGenerator):
         self.strings = True;
 
     def Init(self):
+        self.enumValidMacro = CEnumValidMacro(enum=self)
         self.validatorFunction = CEnumValidatorFunction(enum=self)
         self.enumNameFunction = CEnumNameFunction(enum=self)
         self.enumValueFunction = CEnumValueFunction(enum=self)
         self.enumDescFunction = CEnumDescFunction(enum=self)
-        self.enumValidMacro = CEnumValidMacro(enum=self)
+        if self.IsBitFlags():
+            self.flagsValidMacro = CEnumFlagsValidMacro(enum=self)
+            self.flagsFormatFunction = CEnumFlagsFormatFunction(enum=self)
 
 
 
@@ -297,7 +483,7 @@ class CEnumGenerator(CObjectGenerator):
                 # We've already normalized this data
                 return data
 
-            nmember = util.DotDict(dict(name=None,value=None,desc=None))
+            nmember = util.DotDict(name=None,value=None,desc=None)
             if 'memberfilter' in data:
                 nmember.update(eval(data['memberfilter']))
             elif type(m) == str:
@@ -363,6 +549,116 @@ class CEnumGenerator(CObjectGenerator):
         return True
 
 
+    def IsDense(self):
+        """ Determine whether our values are exactly 0 .. len(members)-1 """
+        if not self.IsLinear():
+            return False
+
+        # Explicitly linear enums may still carry their own values.
+        if self.novalue == False:
+            for member in self.members:
+                if member.value:
+                    return False
+
+        return True
+
+
+    def IsBitFlags(self):
+        """ Determine whether members are assigned consecutive bits """
+        return getattr(self, 'flags', None) is True
+
+    def FlagOffset(self):
+        return getattr(self, "flag_offset", 0)
+
+    def FlagsMask(self):
+        """ Returns the mask of all flag bits """
+        return ((1 << len(self.members)) - 1) << self.FlagOffset()
+
+    def FlagsMaskName(self):
+        return "%s_FLAGS_MASK" % self.f.InMacro(self.name)
+
+
+    def MemberValues(self):
+        """ Returns the integer value of each member, or None if unknown """
+
+        # This mirrors the value assignment in Define()
+        values = []
+        v = 0
+        for (index, member) in enumerate(self.members):
+            if hasattr(self, 'flags'):
+                if self.flags is True:
+                    v = 1 << (self.FlagOffset() + index)
+                else:
+                    v = None
+            elif member.value and (self.novalue == False):
+                try:
+                    v = int(str(member.value), 0)
+                except ValueError:
+                    # Symbolic value
+                    v = None
+            elif v is not None and index > 0:
+                v += 1
+            values.append(v)
+        return values
+
+
+    # Largest value range validated with a dense table
+    denseValidatorRange = 256
+    # Largest enum validated with a switch
+    switchValidatorSize = 128
+
+    def ValidatorStrategy(self):
+        """ Choose how the validator function checks nonlinear values """
+
+        #
+        # Specify 'validator: dense|switch|bsearch|map' to override
+        # the choice made from the value distribution.
+        #
+        values = self.MemberValues()
+        known = None not in values
+
+        if hasattr(self, 'validator'):
+            strategy = self.validator
+            if strategy not in [ 'dense', 'switch', 'bsearch', 'map' ]:
+                raise Exception("Unknown validator '%s' for enum %s" %
+                                (strategy, self.name))
+            if strategy in [ 'dense', 'bsearch' ] and not known:
+                raise Exception("The %s validator for enum %s requires"
+                                " integer values" % (strategy, self.name))
+            return strategy
+
+        if not known:
+            # Symbolic values may evaluate to the same integer, which
+            # a switch would reject. Use 'validator: switch' to opt in.
+            return 'map'
+
+        span = max(values) - min(values) + 1
+        if span <= self.denseValidatorRange and span <= 8 * len(values):
+            return 'dense'
+        if len(values) <= self.switchValidatorSize:
+            return 'switch'
+        return 'bsearch'
+
+
+    def SortedLookup(self):
+        """ Determine whether names are resolved by binary search """
+
+        #
+        # Specify 'lookup: sorted' to generate a sorted name table
+        # for the value function instead of a linear map scan.
+        #
+        lookup = getattr(self, 'lookup', 'linear')
+        if lookup == 'linear':
+            return False
+        if lookup != 'sorted':
+            raise Exception("Unknown lookup '%s' for enum %s" % (lookup,
+                                                                 self.name))
+
+        # Duplicate names must resolve to the first entry, as in the map.
+        names = [ m.strname if m.strname else m.name for m in self.members ]
+        return len(set(names)) == len(names)
+
+
     def IncludeLast(self):
         """ Determines whether the Last entry is included in this enum"""
         # Last makes no sense for nonlinear enums
@@ -426,6 +722,20 @@ class CEnumGenerator(CObjectGenerator):
     def MapTableType(self):
         return self.struct.name
 
+    def DenseLookupBody(self, table, strings):
+        """ Function body returning strings[e] for dense enums """
+        s = "    static const char* const %s[] = {\n" % table
+        for string in strings:
+            s += "        \"%s\",\n" % string
+        s += "    };\n"
+        s += """    if(%s) {
+        return %s[e];
+    }
+    else {
+        return "-invalid value for enum type '%s'";
+    }""" % (self.enumValidMacro.Range('e'), table, self.name)
+        return s
+
 
     ############################################################
     #
@@ -434,7 +744,7 @@ class CEnumGenerator(CObjectGenerator):
     # These methods generate code for this enumeration
     #
     ############################################################
-    def Define(self):
+    def EmitDefine(self, out):
         """ Generate an Enum Definition """
 
         #
@@ -442,27 +752,27 @@ class CEnumGenerator(CObjectGenerator):
         # If you don't want a typedef, specify 'typedef:False'
         # in the enum specification
         #
-        s = "/** %s */\n" % (self.name)
+        out.write("/** %s */\n" % (self.name))
         if self.IncludeTypedef():
-            s += "typedef "
+            out.write("typedef ")
 
-        s += "enum %s {\n" % self.f.EnumName(self.name)
-        for member in self.members:
-            s += "    %s" % self.f.EnumEntry(member.name, self.name)
+        out.write("enum %s {\n" % self.f.EnumName(self.name))
+        offset = self.FlagOffset()
+        for (index, member) in enumerate(self.members):
+            out.write("    %s" % self.f.EnumEntry(member.name, self.name))
             if hasattr(self, 'flags'):
                 if self.flags is True:
-                    offset = getattr(self, "flag_offset", 0)
-                    s += " = (1 << %d)" % (offset + self.members.index(member))
+                    out.write(" = (1 << %d)" % (offset + index))
                 else:
-                    s += " = (1 << %s%s)" % (self.flags, member.name)
+                    out.write(" = (1 << %s%s)" % (self.flags, member.name))
             elif member.value and (self.novalue == False) :
                 # Value specified
                 if hasattr(self, 'hex'):
-                    s += " = 0x%x" % int(member.value)
+                    out.write(" = 0x%x" % int(member.value))
                 else:
-                    s += " = %s" % member.value
+                    out.write(" = %s" % member.value)
 
-            s += ",\n"
+            out.write(",\n")
 
         #
         # The default generation includes an automatically generated
@@ -479,29 +789,31 @@ class CEnumGenerator(CObjectGenerator):
         lastMember = member.name
 
         if self.IncludeLast() != False:
-            s += "    %s = %s,\n" % (
+            out.write("    %s = %s,\n" % (
                 self.f.EnumLast(self.name),
-                self.f.EnumEntry(lastMember, self.name))
+                self.f.EnumEntry(lastMember, self.name)))
 
         if self.IncludeCount() != False:
-            s += "    %s,\n" % self.f.EnumCount(self.name)
+            out.write("    %s,\n" % self.f.EnumCount(self.name))
 
         if self.IncludeInvalid() != False:
             value = self.IncludeInvalid()
             if value is True:
                 value = -1;
-            s += "    %s = %s,\n" % (self.f.EnumInvalid(self.name), value)
+            out.write("    %s = %s,\n" % (self.f.EnumInvalid(self.name), value))
 
-        s += "}"
+        out.write("}")
 
         if self.IncludeTypedef():
-            s += " %s" % self.f.TypedefEnumName(self.name)
+            out.write(" %s" % self.f.TypedefEnumName(self.name))
 
-        s += ";\n"
-        return s
+        out.write(";\n")
 
+    def Define(self):
+        return self.Emitted(self.EmitDefine)
 
-    def StringsMacro(self):
+
+    def EmitStringsMacro(self, out):
         """ Output the STRINGS macro """
 
         # The String Macro can only generated for Linear enums
@@ -511,97 +823,117 @@ class CEnumGenerator(CObjectGenerator):
 
         if self.strings == False:
             # No strings for this enum
-            return ""
+            return
 
-        s = "/** Strings macro. */\n"
-        s += "#define %s_STRINGS \\\n" % self.f.InMacro(self.name)
-        s += "{\\\n"
+        out.write("/** Strings macro. */\n")
+        out.write("#define %s_STRINGS \\\n" % self.f.InMacro(self.name))
+        out.write("{\\\n")
 
         for member in self.members:
-            s += "    \"%s\", \\\n" % (member.strname if member.strname else member.name)
+            out.write("    \"%s\", \\\n" % (member.strname if member.strname else member.name))
 
-        s += "}\n"
-        return s
+        out.write("}\n")
 
+    def StringsMacro(self):
+        return self.Emitted(self.EmitStringsMacro)
 
+    def EmitFlagsMacros(self, out):
+        """ Output the flags mask and flags word validator """
+        out.write("/** All flags. */\n")
+        out.write("#define %s 0x%xU\n\n" % (self.FlagsMaskName(),
+                                            self.FlagsMask()))
+        out.write(self.flagsValidMacro.Define() + "\n")
 
+    def FlagsMacros(self):
+        return self.Emitted(self.EmitFlagsMacros)
 
-    def MapTable(self, static=False):
+
+
+    def EmitMapTable(self, out, static=False):
         """ Output the enum map table """
-        s = ""
         if static:
-            s += self.f.Static() + " "
+            out.write(self.f.Static() + " ")
 
-        s += self.util.mapstruct.DefineTable(self.MapTableName())
-        s += "{\n";
+        out.write(self.util.mapstruct.DefineTable(self.MapTableName()))
+        out.write("{\n")
 
         for member in self.members:
-            s += """    { "%s", %s },\n""" % (
+            out.write("""    { "%s", %s },\n""" % (
                 member.strname if member.strname else member.name,
-                self.f.EnumEntry(member.name, self.name))
-        s += "    { NULL, 0 }\n"
-        s += "};\n"
-        return s
+                self.f.EnumEntry(member.name, self.name)))
+        out.write("    { NULL, 0 }\n")
+        out.write("};\n")
 
-    def DescMapTable(self, static=False):
+    def MapTable(self, static=False):
+        return self.Emitted(self.EmitMapTable, static)
+
+    def EmitDescMapTable(self, out, static=False):
         """ Output the enum desc map table """
-        s = ""
         if static:
-            s += self.f.Static() + " "
+            out.write(self.f.Static() + " ")
 
-        s += self.util.mapstruct.DefineTable(self.DescMapTableName())
-        s += "{\n";
+        out.write(self.util.mapstruct.DefineTable(self.DescMapTableName()))
+        out.write("{\n")
 
         for member in self.members:
-            s += """    { "%s", %s },\n""" % (
+            out.write("""    { "%s", %s },\n""" % (
                 member.desc,
-                self.f.EnumEntry(member.name, self.name))
-        s += "    { NULL, 0 }\n"
-        s += "};\n"
-        return s
+                self.f.EnumEntry(member.name, self.name)))
+        out.write("    { NULL, 0 }\n")
+        out.write("};\n")
 
+    def DescMapTable(self, static=False):
+        return self.Emitted(self.EmitDescMapTable, static)
 
-    def EnumProtos(self):
-        s = ""
-        s += self.enumNameFunction.Prototype() + "\n"
-        s += self.enumValueFunction.Prototype() + "\n"
-        s += self.enumDescFunction.Prototype() + "\n"
+
+    def EmitEnumProtos(self, out):
+        out.write(self.enumNameFunction.Prototype() + "\n")
+        out.write(self.enumValueFunction.Prototype() + "\n")
+        out.write(self.enumDescFunction.Prototype() + "\n")
         if not self.IsLinear():
-            s += self.validatorFunction.Prototype() + "\n"
-        s += self.enumValidMacro.Define() + "\n"
+            out.write(self.validatorFunction.Prototype() + "\n")
+        out.write(self.enumValidMacro.Define() + "\n")
+        if self.IsBitFlags():
+            out.write(self.flagsFormatFunction.Prototype() + "\n")
+            self.EmitFlagsMacros(out)
 
-        return s
+    def EnumProtos(self):
+        return self.Emitted(self.EmitEnumProtos)
 
-    def SupportHeader(self):
-        s = ""
+    def EmitSupportHeader(self, out):
         if self.IsLinear():
-            s += self.StringsMacro()
-        s += self.EnumProtos()
-        s += self.util.mapstruct.ExternTable(self.MapTableName())
-        s += self.util.mapstruct.ExternTable(self.DescMapTableName())
-        return s
+            self.EmitStringsMacro(out)
+        self.EmitEnumProtos(out)
+        out.write(self.util.mapstruct.ExternTable(self.MapTableName()))
+        out.write(self.util.mapstruct.ExternTable(self.DescMapTableName()))
+
+    def SupportHeader(self):
+        return self.Emitted(self.EmitSupportHeader)
+
+    def EmitHeader(self, out):
+        self.EmitDefine(out)
+        out.write("\n")
+        self.EmitSupportHeader(out)
 
     def Header(self):
-        s = ""
-        s += self.Define() + "\n"
-        s += self.SupportHeader();
-        return s;
+        return self.Emitted(self.EmitHeader)
 
 
-    def Source(self):
-        s = ""
-        s += self.MapTable() + "\n"
-        s += self.DescMapTable() + "\n"
-        s += self.enumNameFunction.Define() + "\n"
-        s += self.enumValueFunction.Define() + "\n"
-        s += self.enumDescFunction.Define() + "\n"
+    def EmitSource(self, out):
+        self.EmitMapTable(out)
+        out.write("\n")
+        self.EmitDescMapTable(out)
+        out.write("\n")
+        out.write(self.enumNameFunction.Define() + "\n")
+        out.write(self.enumValueFunction.Define() + "\n")
+        out.write(self.enumDescFunction.Define() + "\n")
         if not self.IsLinear():
-            s += self.validatorFunction.Define() + "\n"
+            out.write(self.validatorFunction.Define() + "\n")
+        if self.IsBitFlags():
+            out.write(self.flagsFormatFunction.Define() + "\n")
 
-        return s
-
-        for member in self.members:
-            s += "    \"%s\", \\\n" % member.name
+    def Source(self):
+        return self.Emitted(self.EmitSource)
 
     def __getitem__(self, item):
         for m in self.members:
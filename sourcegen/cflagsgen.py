@@ -43,8 +43,7 @@ class CFlagsGenerator(CObjectGenerator):
                 self.width = + len(name)
 
 
-    def Define(self):
-        s = ""
+    def EmitDefine(self, out):
         bitcount = 0
         for entry in self.members:
             name = entry.keys()[0]
@@ -52,7 +51,7 @@ class CFlagsGenerator(CObjectGenerator):
             value = None
 
             if 'doc' in flag:
-                s += self.f.Comment(flag['doc']) # + "\n"
+                out.write(self.f.Comment(flag['doc'])) # + "\n"
             if 'value' in flag:
                 value = "%s" % (flag['value'])
             elif 'shift' in flag:
@@ -72,9 +71,10 @@ class CFlagsGenerator(CObjectGenerator):
             else:
                 widename += " "*(1+len(self.f.InMacro(self.name)))
 
-            s += "#define %s %s\n" % (self.f.InMacro(widename), value)
+            out.write("#define %s %s\n" % (self.f.InMacro(widename), value))
 
-        return s;
+    def Define(self):
+        return self.Emitted(self.EmitDefine)
 
     #
     # Todo -- Flags Parser/Lookup/Output Routines
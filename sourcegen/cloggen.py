@@ -58,30 +58,29 @@ class CLogGenerator(CObjectGenerator):
     # Generation Methods
     #
     ############################################################
-    def Header(self):
+    def EmitHeader(self, out):
         # prototypes for all selected utilities
         NAME = self.name.upper()
         name = self.name
 
-        s = ""
-        s += "#include <stdint.h>\n"
-        s += "#include <AIM/aim_valist.h>\n\n"
-        s += self.logEnum.Define();
-        s += "extern uint32_t %s_log_flags;\n\n" % name
+        out.write("#include <stdint.h>\n")
+        out.write("#include <AIM/aim_valist.h>\n\n")
+        out.write(self.logEnum.Define())
+        out.write("extern uint32_t %s_log_flags;\n\n" % name)
 
-        s += "#ifndef %s_LOG_PREFIX1\n" % NAME
-        s += "#define %s_LOG_PREFIX1 \"\"\n" % NAME
-        s += "#endif\n"
-        s += "#ifndef %s_LOG_PREFIX2\n" % NAME
-        s += "#define %s_LOG_PREFIX2 \"\"\n" % NAME
-        s += "#endif"
+        out.write("#ifndef %s_LOG_PREFIX1\n" % NAME)
+        out.write("#define %s_LOG_PREFIX1 \"\"\n" % NAME)
+        out.write("#endif\n")
+        out.write("#ifndef %s_LOG_PREFIX2\n" % NAME)
+        out.write("#define %s_LOG_PREFIX2 \"\"\n" % NAME)
+        out.write("#endif")
 
 
-        s += """
+        out.write("""
 /*
  * Module-level macros.
  */
-"""
+""")
         for f in self.logFlags:
             FLAG = f[0].upper()
             flag = f[0];
@@ -90,35 +89,35 @@ class CLogGenerator(CObjectGenerator):
                 # These are options, not loggables
                 continue
 
-            s += """
+            out.write("""
 #define %(NAME)s_LOG_%(FLAG)s(...) \\
     %(NAME)s_LOG_OUTPUT(%(NAME)s_LOG_FLAG_%(flag)s, __func__, __FILE__, __LINE__, \\
                   "%(name)s" %(NAME)s_LOG_PREFIX1 %(NAME)s_LOG_PREFIX2 ": " "%(FLAG)s: " AIM_VA_ARGS_FIRST(__VA_ARGS__) AIM_VA_ARGS_REST(__VA_ARGS__));\n""" % dict(
-                NAME=NAME, FLAG=FLAG, flag=flag, name=name)
+                NAME=NAME, FLAG=FLAG, flag=flag, name=name))
 
-            s += """
+            out.write("""
 #define %(NAME)s_OBJ_LOG_%(FLAG)s(_object, ...) \\
     %(NAME)s_LOG_OUTPUT(%(NAME)s_LOG_FLAG_%(flag)s, __func__, __FILE__, __LINE__, \\
                   "%(name)s" %(NAME)s_LOG_PREFIX1 %(NAME)s_LOG_PREFIX2 "(%%s): " "%(FLAG)s: " AIM_VA_ARGS_FIRST(__VA_ARGS__), \\
                   (_object)->log_string AIM_VA_ARGS_REST(__VA_ARGS__))\n""" % dict(
-                NAME=NAME, FLAG=FLAG, flag=flag, name=name)
+                NAME=NAME, FLAG=FLAG, flag=flag, name=name))
 
-            s += """
+            out.write("""
 /*
  * Shortcut macros for function enter/exit tracing.
  */
 #define %(NAME)s_FENTER(...) \\
      %(NAME)s_LOG_OUTPUT(%(NAME)s_LOG_FLAG_FTRACE, __func__, __FILE__, __LINE__, \\
                   "%(name)s" %(NAME)s_LOG_PREFIX1 %(NAME)s_LOG_PREFIX2 ": " "ENTER(%%s): " AIM_VA_ARGS_FIRST(__VA_ARGS__), __func__ AIM_VA_ARGS_REST(__VA_ARGS__))\n""" % dict(
-                NAME=NAME, name=name)
+                NAME=NAME, name=name))
 
-            s += """
+            out.write("""
 #define %(NAME)s_FEXIT(...) \\
      %(NAME)s_LOG_OUTPUT(%(NAME)s_LOG_FLAG_FTRACE, __func__, __FILE__, __LINE__, \\
                   "%(name)s" %(NAME)s_LOG_PREFIX1 %(NAME)s_LOG_PREFIX2 ": " "EXIT(%%s): " AIM_VA_ARGS_FIRST(__VA_ARGS__), __func__ AIM_VA_ARGS_REST(__VA_ARGS__))\n""" % dict(
-                      NAME=NAME, name=name)
+                      NAME=NAME, name=name))
 
-            s += """
+            out.write("""
 /*
  * %(NAME)s_LOG_%(FLAG)s and %(NAME)s_OBJ_LOG_%(FLAG)s can always be called, but they're hard on the
  * carpal tunnel.
@@ -148,28 +147,28 @@ class CLogGenerator(CObjectGenerator):
 #define %(NAME)s_O%(FLAG)s  %(NAME)s_OBJ_LOG_%(FLAG)s
 
 #endif
-""" % dict(NAME=NAME, FLAG=FLAG)
+""" % dict(NAME=NAME, FLAG=FLAG))
 
-            s += """
+            out.write("""
 #if %(NAME)s_CONFIG_INCLUDE_LOGGING == 1
 #define %(NAME)s_LOG_OUTPUT %(name)s_log_output
 #else
 #define %(NAME)s_LOG_OUTPUT(...)
 #endif
-""" % dict(NAME=NAME, name=name)
+""" % dict(NAME=NAME, name=name))
 
-        s += """
+        out.write("""
 
 /*
  * This function processes log messages for this module.
  */
 void %(name)s_log_output(%(name)s_log_flag_t flag, const char* fname, const char* file,
                        int line, const char* fmt, ...);
-""" % dict(name=name)
+""" % dict(name=name))
 
 
 
-        s += """
+        out.write("""
 /*
 * This datastructure encapsulates this module's log info.
 * External log providers can access this structure to affect
@@ -193,39 +192,39 @@ typedef struct %(name)s_log_info_s {
 } %(name)s_log_info_t;
 
 extern %(name)s_log_info_t %(name)s_log_info;
-""" % dict(name=self.name)
+""" % dict(name=self.name))
 
-        return s;
+    def Header(self):
+        return self.Emitted(self.EmitHeader)
 
-    def Source(self):
+    def EmitSource(self, out):
 
         name = self.name;
         NAME = self.name.upper()
 
-        s = ""
 
-        s += """
+        out.write("""
 /*
  * %s Log Info Structure
  */
-""" % self.name.upper()
+""" % self.name.upper())
 
-        s += """
+        out.write("""
 #ifndef %s_CONFIG_LOG_FLAGS_DEFAULT
 #define %s_CONFIG_LOG_FLAGS_DEFAULT 0xFFFF
 #endif
-""" % (NAME, NAME)
+""" % (NAME, NAME))
 
-        s += """
+        out.write("""
 %s_log_info_t %s_log_info = {
     \"%s\",
     %s_CONFIG_LOG_FLAGS_DEFAULT,
     1,
     &aim_pvs_stderr
 };
-""" % (name, name, name, NAME )
+""" % (name, name, name, NAME ))
 
-        s += """
+        out.write("""
 #ifndef %s_CONFIG_LOG_MESSAGE_SIZE
 #define %s_CONFIG_LOG_MESSAGE_SIZE 256
 #endif
@@ -254,9 +253,10 @@ void %s_log_output(%s_log_flag_t flag, const char* fname, const char* file,
     va_end(vargs);
 }
 """ % (NAME, NAME, name, name, NAME, name, name, NAME, name, NAME, NAME,
-       name, NAME, NAME, NAME, name)
+       name, NAME, NAME, NAME, name))
 
-        return s;
+    def Source(self):
+        return self.Emitted(self.EmitSource)
 
 
 ###############################################################################
@@ -30,22 +30,120 @@
 #################################################################
 
 from util import *
+import itertools
+import tempfile
+import hashlib
+import cPickle
 import yaml
+import os
+
+# Use the libyaml parser when it is available.
+try:
+    from yaml import CLoader as YamlLoader
+except ImportError:
+    from yaml import Loader as YamlLoader
+
+# Every change to the definitions held by any ConfigManager gets
+# a new snapshot identifier.
+_snapshots = itertools.count(1)
 
 class ConfigManager:
-    def __init__(self):
+    def __init__(self, cacheDir=None):
         self.configs = []
+        # Parsed YAML definitions are cached as pickles in the 'defs'
+        # subdirectory of this directory, if specified. Loading a pickle
+        # can run arbitrary code, so the directory must be trusted.
+        self.cacheDir = cacheDir
+        self.snapshot = next(_snapshots)
+
+        #
+        # Lookup indexes, maintained by AddConfig().
+        #
+        # (type, name)  -> (config position, entry)
+        self.entryIndex = {}
+        # (type, alias) -> (config position, name list)
+        self.aliasIndex = {}
+        # (type, tag)   -> set of names
+        self.tagIndex = {}
+        # type          -> set of names
+        self.allIndex = {}
+
+    def AddConfig(self, config):
+        """Add a loaded definition config"""
+        self.configs.append(config)
+        self.snapshot = next(_snapshots)
+        self.IndexConfig(len(self.configs) - 1, config)
+
+    def IndexConfig(self, position, config):
+        """Add a config's definitions to the lookup indexes.
+
+        Earlier configs take precedence over later ones for entries
+        and aliases. 'ALL' and tag lookups include all configs."""
+
+        definitions = config.definitions
+        if definitions is None:
+            return
+
+        for (type_, entries) in definitions.iteritems():
+            if not isinstance(entries, dict):
+                continue
+            for (k, v) in entries.iteritems():
+                self.entryIndex.setdefault((type_, k), (position, v))
+                if k.startswith('__'):
+                    continue
+                self.allIndex.setdefault(type_, set()).add(k)
+                if isinstance(v, dict) and isinstance(v.get('tag'), basestring):
+                    self.tagIndex.setdefault((type_, v['tag']), set()).add(k)
+
+            aliases = entries.get('__aliases__')
+            if isinstance(aliases, dict):
+                for (alias, names) in aliases.iteritems():
+                    self.aliasIndex.setdefault((type_, alias),
+                                               (position, names))
 
     def ImportPModule(self, filename):
         """Import a Python definition Module"""
-        self.configs.append(imp.load_source("X", filename))
+        self.AddConfig(imp.load_source("X", filename))
 
     def ImportYModule(self, filename):
         """Import a YAML definition file"""
         fp = open(filename);
-        self.configs.append(DotDict(yaml.load(fp)))
+        data = fp.read()
         fp.close()
 
+        if self.cacheDir is None:
+            self.AddConfig(DotDict(yaml.load(data, Loader=YamlLoader)))
+            return
+
+        # The normalized definitions are cached by content hash. The
+        # result depends on the yaml version and the loader used.
+        h = hashlib.sha1(data)
+        h.update(yaml.__version__)
+        h.update(YamlLoader.__name__)
+        # Kept apart from the generation cache entries, which are pruned.
+        defsDir = os.path.join(self.cacheDir, "defs")
+        cached = os.path.join(defsDir, h.hexdigest() + ".defs")
+        try:
+            with open(cached, 'rb') as f:
+                config = cPickle.load(f)
+            if not isinstance(config, DotDict):
+                raise ValueError(cached)
+        except Exception:
+            # Missing, truncated, or written by an incompatible version.
+            config = DotDict(yaml.load(data, Loader=YamlLoader))
+            try:
+                if not os.path.isdir(defsDir):
+                    os.makedirs(defsDir)
+                f = tempfile.NamedTemporaryFile(dir=defsDir,
+                                                delete=False)
+                cPickle.dump(config, f, cPickle.HIGHEST_PROTOCOL)
+                f.close()
+                os.rename(f.name, cached)
+            except (IOError, OSError):
+                pass
+
+        self.AddConfig(config)
+
     def ImportDict(self, d):
         """ Import a dict definition """
         if isinstance(d, dict):
@@ -53,7 +151,7 @@ class ConfigManager:
         if isinstance(d, DotDict):
             if not definitions in d:
                 d = { definitions : d }
-            self.configs.append(d)
+            self.AddConfig(d)
         else:
             raise Exception("ImportDict: not a dict")
 
@@ -77,12 +175,10 @@ class ConfigManager:
         if data is not None:
             return data
 
-        for c in self.configs:
-            if type_ in c.definitions:
-                if name in c.definitions[type_]:
-                    return c.definitions[type_][name]
-
-        return None
+        entry = self.entryIndex.get((type_, name))
+        if entry is None:
+            return None
+        return entry[1]
 
     def ObjectNameList(self, type_, name="ALL"):
         """Returns a list of names for the given type
@@ -100,30 +196,24 @@ class ConfigManager:
         The purpose of this function is to facilitate aliases, object
         lists, and multiple object construction during generation."""
 
-        allList = []
-        for c in self.configs:
-            if type_ in c.definitions:
-
-                # Check for an alias first, if they exist.
-                # Note -- this allows you to redefine 'ALL' as you see fit
-                if '__aliases__' in c.definitions[type_]:
-                    if name in c.definitions[type_]['__aliases__']:
-                        return c.definitions[type_]['__aliases__'][name]
+        # The first config defining either an alias or an object with
+        # this name decides. Aliases win within the same config.
+        # Note -- this allows you to redefine 'ALL' as you see fit
+        alias = self.aliasIndex.get((type_, name))
+        entry = self.entryIndex.get((type_, name))
 
-                if name in c.definitions[type_]:
-                    # Specific object name
-                    return [ name ]
+        if alias and (entry is None or alias[0] <= entry[0]):
+            return alias[1]
 
-                for (k,v) in c.definitions[type_].iteritems():
-                    if not k.startswith('__'):
-                        if name == "ALL":
-                            allList.append(k)
-                        else:
-                            if 'tag' in v and name.startswith("tag:"):
-                                tag = name.split(":")[1]
-                                if v['tag'] == tag:
-                                    allList.append(k)
+        if entry:
+            # Specific object name
+            return [ name ]
 
+        if name == "ALL":
+            return sorted(self.allIndex.get(type_, ()))
 
-        return sorted(list(set(allList)))
+        if name.startswith("tag:"):
+            tag = name.split(":")[1]
+            return sorted(self.tagIndex.get((type_, tag), ()))
 
+        return []
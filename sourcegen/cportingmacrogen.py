@@ -37,34 +37,34 @@ class CPortingMacroGenerator(CObjectGenerator):
     # Generation Methods
     #
     ############################################################
-    def Define(self):
+    def EmitDefine(self, out):
         prefix = self.name.upper()
 
-        s = ""
-        s += "#if %s_CONFIG_PORTING_INCLUDE_STDLIB_HEADERS == 1\n" % prefix
-        s += "#include <stdio.h>\n"
-        s += "#include <stdlib.h>\n"
-        s += "#include <string.h>\n"
-        s += "#include <stdarg.h>\n"
-        s += "#include <memory.h>\n"
-        s += "#endif\n\n"
+        out.write("#if %s_CONFIG_PORTING_INCLUDE_STDLIB_HEADERS == 1\n" % prefix)
+        out.write("#include <stdio.h>\n")
+        out.write("#include <stdlib.h>\n")
+        out.write("#include <string.h>\n")
+        out.write("#include <stdarg.h>\n")
+        out.write("#include <memory.h>\n")
+        out.write("#endif\n\n")
 
         for m in self.macros:
             name = m.upper()
             # Breaks macro formatting customization...
             macro = prefix + "_" + name
-            s += "#ifndef %s\n" % macro
-            s += "    #if defined(GLOBAL_%s)\n" % name
-            s += "        #define %s GLOBAL_%s\n" % (macro, name)
-            s += "    #elif %s_CONFIG_PORTING_STDLIB == 1\n" % (prefix)
-            s += "        #define %s %s\n" % (macro, name.lower())
-            s += "    #else\n"
-            s += "        #error The macro %s is required but cannot be defined.\n" % macro
-            s += "    #endif\n"
-            s += "#endif\n"
-            s += "\n"
+            out.write("#ifndef %s\n" % macro)
+            out.write("    #if defined(GLOBAL_%s)\n" % name)
+            out.write("        #define %s GLOBAL_%s\n" % (macro, name))
+            out.write("    #elif %s_CONFIG_PORTING_STDLIB == 1\n" % (prefix))
+            out.write("        #define %s %s\n" % (macro, name.lower()))
+            out.write("    #else\n")
+            out.write("        #error The macro %s is required but cannot be defined.\n" % macro)
+            out.write("    #endif\n")
+            out.write("#endif\n")
+            out.write("\n")
 
-        return s;
+    def Define(self):
+        return self.Emitted(self.EmitDefine)
 
 ###############################################################################
 #
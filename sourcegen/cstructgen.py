@@ -45,23 +45,23 @@ class CStructGenerator(CObjectGenerator):
             return "struct %s" % self.structname
         return "struct %s" % self.f.StructName(self.name)
 
-    def Define(self):
-        s = ""
-        s += self.comment
-        s += "typedef %s {\n" % self.StructName()
+    def EmitDefine(self, out):
+        out.write(self.comment)
+        out.write("typedef %s {\n" % self.StructName())
         for member in self.members:
             if isinstance(member, str):
-                s += "    %s;\n" % member
+                out.write("    %s;\n" % member)
             elif isinstance(member, list):
                 if member[0] == "__self__":
                     member[0] = "struct %s*" % self.StructName()
-                s += """    /** %s */\n""" % (member[1])
-                s += "    %s %s;\n" % (member[0], member[1])
+                out.write("""    /** %s */\n""" % (member[1]))
+                out.write("    %s %s;\n" % (member[0], member[1]))
             else:
                 raise Exception("bad struct definition")
-        s += "} %s;\n" % self.TypedefName()
+        out.write("} %s;\n" % self.TypedefName())
 
-        return s
+    def Define(self):
+        return self.Emitted(self.EmitDefine)
 
     def Declare(self):
         return "typedef %s;\n" % self.TypedefName()
@@ -117,25 +117,27 @@ class CUtilGenerator(CObjectGenerator):
     # Generation Methods
     #
     ############################################################
-    def Header(self):
+    def EmitHeader(self, out):
         # prototypes for all selected utilities
-        s = ""
         for u in self.objects:
             if u in self.pobjects:
-                s += self.pobjects[u].Header();
+                out.write(self.pobjects[u].Header())
             else:
                 # Requested something we don't have.
-                s += "/* Utility '%s' does not exist */\n" % u
-        return s;
+                out.write("/* Utility '%s' does not exist */\n" % u)
 
-    def Define(self):
-        s = ""
+    def Header(self):
+        return self.Emitted(self.EmitHeader)
+
+    def EmitDefine(self, out):
         for u in self.objects:
             if u in self.pobjects:
-                s += self.pobjects[u].Define();
+                out.write(self.pobjects[u].Define())
             else:
-                s += "/* Utility '%s' does not exist */\n" % u
-        return s;
+                out.write("/* Utility '%s' does not exist */\n" % u)
+
+    def Define(self):
+        return self.Emitted(self.EmitDefine)
 
 ###############################################################################
 #
@@ -41,15 +41,17 @@ class CXEnumGenerator(CObjectGenerator):
     # Generation Methods
     #
     ############################################################
-    def Define(self):
+    def EmitDefine(self, out):
 
-        s = "#ifdef %s\n" % self.name
+        out.write("#ifdef %s\n" % self.name)
 
         for (k,v) in sorted(self.members.iteritems()):
             desc = v['desc'] if 'desc' in v else ""
-            s += util.fcall(self.name, "%s, \"%s\"" % (k, desc)) + "\n"
-        s += "#undef %s\n" % self.name
-        s += "#endif\n"
-        return s
+            out.write(util.fcall(self.name, "%s, \"%s\"" % (k, desc)) + "\n")
+        out.write("#undef %s\n" % self.name)
+        out.write("#endif\n")
+
+    def Define(self):
+        return self.Emitted(self.EmitDefine)
 
 
@@ -43,8 +43,7 @@ class CXMacroGenerator(CObjectGenerator):
     # Generation Methods
     #
     ############################################################
-    def XMacroEntries(self):
-        s = ""
+    def EmitXMacroEntries(self, out):
         for args in self.members:
             arglist = []
             # hack for enumerations with custom description fields
@@ -60,40 +59,44 @@ class CXMacroGenerator(CObjectGenerator):
                 arglist.append(args[0].upper())
                 arglist.append(args[0].lower())
 
-            s += util.fcall(self.name, arglist) + "\n"
-        return s
+            out.write(util.fcall(self.name, arglist) + "\n")
+
+    def XMacroEntries(self):
+        return self.Emitted(self.EmitXMacroEntries)
 
 
-    def DefineSubmacros(self):
+    def EmitDefineSubmacros(self, out):
 
-        s = ""
         members = util.listifyElements(self.members)
 
         for entry in members:
-            s += "#ifndef %s\n#define %s %s\n#endif\n\n" % (entry[0],
-                                                            entry[0],
-                                                            self.name)
+            out.write("#ifndef %s\n#define %s %s\n#endif\n\n" % (entry[0],
+                                                                 entry[0],
+                                                                 self.name))
         for entry in members:
             subgen = CXMacroGenerator(name=entry[0], initargs=entry[1])
-            s += subgen.XMacroEntries()
+            subgen.EmitXMacroEntries(out)
 
-        s += "\n"
+        out.write("\n")
         for entry in members:
-            s += "#undef %s\n" % entry[0]
+            out.write("#undef %s\n" % entry[0])
 
-        return s
+    def DefineSubmacros(self):
+        return self.Emitted(self.EmitDefineSubmacros)
 
 
-    def Define(self):
-        s = "#ifdef %s\n" % self.name
+    def EmitDefine(self, out):
+        out.write("#ifdef %s\n" % self.name)
         if self.submacros:
-            s += self.DefineSubmacros()
+            self.EmitDefineSubmacros(out)
         else:
             self.members = util.listifyElements(self.members)
-            s += self.XMacroEntries()
-        s += "#undef %s\n" % self.name
-        s += "#endif\n"
-        return s
+            self.EmitXMacroEntries(out)
+        out.write("#undef %s\n" % self.name)
+        out.write("#endif\n")
+
+    def Define(self):
+        return self.Emitted(self.EmitDefine)
 
 
 
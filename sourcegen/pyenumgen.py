@@ -50,7 +50,7 @@ class PyEnumGenerator(CEnumGenerator):
     # These methods generate code for this enumeration
     #
     ############################################################
-    def Define(self):
+    def EmitDefine(self, out):
         """ Generate an Enum Definition """
         #
         # The default behavior is to typedef all enums.
@@ -58,34 +58,36 @@ class PyEnumGenerator(CEnumGenerator):
         # in the enum specification
         #
         v = 0
-        s = "class %s(Enumeration):\n" % (self.name.upper())
-        for member in self.members:
+        out.write("class %s(Enumeration):\n" % (self.name.upper()))
+        for (index, member) in enumerate(self.members):
             name = self.f.EnumEntry(member.name, "")[1:]
             if not IDENT_RE.match(name):
                 name = '_' + name
-            s += "    %s" % name
+            out.write("    %s" % name)
             if member.value and (self.novalue == False):
                 # Value specified
                 if hasattr(self, 'hex'):
-                    s += " = EnumerationItem(0x%x)" % int(member.value)
+                    out.write(" = EnumerationItem(0x%x)" % int(member.value))
                 else:
                     if hasattr(self, 'flags') and self.flags is True:
-                        s += " = (1 << %d)" % int(member.value)
+                        out.write(" = (1 << %d)" % int(member.value))
                     else:
-                        s += " = %s" % member.value
+                        out.write(" = %s" % member.value)
             elif hasattr(self, 'flags'):
                 if self.flags is True:
-                    s += " = (1 << %d)" % (self.members.index(member))
+                    out.write(" = (1 << %d)" % index)
                 else:
                     raise Exception("Not handled.")
             else:
-                s += " = %d" % v
+                out.write(" = %d" % v)
                 v += 1
 
-            s += "\n"
+            out.write("\n")
+
+        out.write("\n")
 
-        s += "\n"
-        return s
+    def Define(self):
+        return self.Emitted(self.EmitDefine)
 
 
     def __getitem__(self, item):
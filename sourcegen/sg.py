@@ -24,11 +24,10 @@
 #
 #################################################################
 
-import sourcegen
-import cobjectgen
 import argparse
+import socket
+import json
 import sys
-import cm
 import os
 
 gParser = argparse.ArgumentParser(description='sg -- Source Generators')
@@ -42,36 +41,128 @@ replace the input file with the output. Does not change the input file if
 no changes are detected. Use --o stdout to output results to stdout""")
 gParser.add_argument('-v', help='Verbose Output')
 gParser.add_argument('-f', help="Formatter", default="default")
+gParser.add_argument('-j', type=int, default=1, metavar='N',
+                     help="""Generate input files in place using N worker
+processes. Ignored when -o is specified.""")
+gParser.add_argument('--cache', metavar='DIR',
+                     help="""Skip in-place generation of files whose
+contents, definitions, and generators have not changed since they were
+last generated, using the cache in DIR. Parsed definition files are
+also cached there, as pickles. Only use a DIR that you trust.""")
+gParser.add_argument('--cache-size', type=int, default=64, metavar='MB',
+                     help="Maximum size of the generation cache.")
+gParser.add_argument('--client', metavar='SOCKET',
+                     help="""Send the request to the sourcegen server
+listening on SOCKET (see sgserver.py). Falls back to local generation if
+no server is running.""")
+gParser.add_argument('--profile', action='store_true',
+                     help="""Report the wall time, objects created and output
+size of each directive, aggregated per file and per expression. Implies
+-j 1.""")
+gParser.add_argument('--profile-top', type=int, default=10, metavar='N',
+                     help="Number of entries shown in each profile table.")
+gParser.add_argument('--pstats', metavar='FILE',
+                     help="Write cProfile statistics for the run to FILE.")
 gArgs = gParser.parse_args()
 
-cman = cm.ConfigManager()
+if isinstance(gArgs.i, str):
+    gArgs.i = [ gArgs.i ]
 
-if gArgs.d:
-    for d in gArgs.d:
-        cman.Import(d)
 
-sg = sourcegen.SourceGenerator(cman, cobjectgen.CObjectFactory(cman))
+def Report(inf, diff):
+    """ Report the result of generating inf in place """
+    print "generate: %s:" % inf,
+    if diff:
+        print "\x1B[35m" + "\x1B[1m" + "updated" + "\x1B[39m" + "\x1B[0m"
+    else:
+        print "\x1B[37m" + "no changes" + "\x1B[39m"
 
-if gArgs.i:
 
-    if isinstance(gArgs.i, str):
-        gArgs.i = [ gArgs.i ]
+def ClientGenerate():
+    """ Generate through a running sourcegen server.
+    Returns False if the server could not be reached. """
+    request = dict(cwd=os.getcwd(), d=gArgs.d, i=gArgs.i, o=gArgs.o,
+                   j=gArgs.j, cache=gArgs.cache,
+                   cache_size=gArgs.cache_size)
+    s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        s.connect(gArgs.client)
+        s.sendall(json.dumps(request) + "\n")
+        reply = s.makefile('r').readline()
+    except socket.error:
+        return False
+    finally:
+        s.close()
 
-    for inf in gArgs.i:
-        if not os.path.isfile(inf):
-            continue
+    if not reply:
+        return False
 
-        of = gArgs.o
-        if of is None:
-            of = inf
-        print "generate: %s:" % inf,
+    reply = json.loads(reply)
+    if 'error' in reply:
+        sys.stderr.write(reply['error'])
+        sys.exit(1)
 
-        diff = sg.Generate(inf, of)
-        if inf is of:
-            if diff:
-                print "\x1B[35m" + "\x1B[1m" + "updated" + "\x1B[39m" + "\x1B[0m"
-            else:
-                print "\x1B[37m" + "no changes" + "\x1B[39m"
+    sys.stderr.write(reply.get('warning', ""))
+    sys.stdout.write(reply['stdout'])
+    if gArgs.o is None:
+        for (inf, diff) in reply['results']:
+            Report(inf, diff)
 
+    if gArgs.v:
+        sys.stderr.write("wrote %d bytes\n" % reply['written'])
+    return True
 
 
+def LocalGenerate():
+    import sourcegen
+    import cobjectgen
+    import cm
+
+    cman = cm.ConfigManager(gArgs.cache)
+
+    if gArgs.d:
+        for d in gArgs.d:
+            cman.Import(d)
+
+    cache = None
+    if gArgs.cache:
+        cache = sourcegen.GenerationCache(gArgs.cache, gArgs.d,
+                                          gArgs.cache_size*1024*1024)
+
+    profile = None
+    if gArgs.profile:
+        profile = sourcegen.DirectiveProfile()
+
+    factory = cobjectgen.CObjectFactory(cman)
+    sg = sourcegen.SourceGenerator(cman, factory, cache, profile)
+
+    if gArgs.i:
+        files = [ inf for inf in gArgs.i if os.path.isfile(inf) ]
+
+        if gArgs.o is None:
+            for (inf, diff) in sg.GenerateList(files, gArgs.j):
+                Report(inf, diff)
+        else:
+            for inf in files:
+                # The generated text follows the prefix on stdout.
+                print "generate: %s:" % inf,
+                sg.Generate(inf, gArgs.o)
+
+    if cache:
+        cache.Prune()
+
+    if gArgs.v:
+        sys.stderr.write(factory.EvalCacheStats() + "\n")
+        sys.stderr.write("wrote %d bytes\n" % sg.bytesWritten)
+
+    if profile:
+        profile.Report(sys.stderr, gArgs.profile_top)
+
+
+if gArgs.pstats:
+    import cProfile
+    prof = cProfile.Profile()
+    prof.runcall(LocalGenerate)
+    prof.dump_stats(gArgs.pstats)
+elif gArgs.profile or not gArgs.client or not ClientGenerate():
+    LocalGenerate()
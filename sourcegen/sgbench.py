@@ -0,0 +1,252 @@
+#!/usr/bin/python2
+#################################################################
+#
+#        Copyright 2013, Big Switch Networks, Inc.
+#
+# Licensed under the Eclipse Public License, Version 1.0 (the
+# "License"); you may not use this file except in compliance
+# with the License. You may obtain a copy of the License at
+#
+#        http://www.eclipse.org/legal/epl-v10.html
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific
+# language governing permissions and limitations under the
+# License.
+#
+#################################################################
+#
+# sgbench.py
+#
+# Source Generator benchmarks.
+#
+# Builds a synthetic definition file with N enums of M members
+# (plus cdefs, xmacros, flags and log macros), then measures:
+#
+#    cm.import        Parsing the definitions with ConfigManager
+#    eval.<expr>      Each generator directive on its own
+#    sg.generate      End-to-end SourceGenerator.Generate()
+#
+# Every benchmark runs in a fresh process. The best wall time of
+# all repeats, the peak RSS growth and the output size are reported.
+#
+# Results can be saved as a JSON baseline with '-o' and compared
+# against a previous baseline with '--compare'.
+#
+#################################################################
+
+import multiprocessing
+import subprocess
+import tempfile
+import resource
+import argparse
+import shutil
+import timeit
+import json
+import yaml
+import sys
+import os
+
+# Directives exercised by the benchmarks.
+DIRECTIVES = [ "enum(ALL).header",
+               "enum(ALL).source",
+               "cdefs(ALL).header",
+               "cdefs(ALL).source",
+               "xmacro(ALL).define",
+               "flags(ALL).define",
+               "aim_custom_log_macro(ALL).header",
+               ]
+
+
+def SyntheticDefinitions(enums, members):
+    """ Returns a definition dict with 'enums' enums of 'members' members """
+    d = dict(enum={}, cdefs={}, xmacro={}, flags={}, aim_custom_log_macro={})
+
+    for i in range(enums):
+        name = "bench_enum%d" % i
+        if i % 3 == 0:
+            # Linear
+            d['enum'][name] = dict(members=[ "m%d" % j for j in range(members) ])
+        elif i % 3 == 1:
+            # Nonlinear, sparse values
+            d['enum'][name] = dict(members=[
+                    { "m%d" % j : dict(value=str(j * 7), desc="member %d" % j) }
+                    for j in range(members) ])
+        else:
+            # Flags
+            d['enum'][name] = dict(flags=True, members=[
+                    "m%d" % j for j in range(min(members, 31)) ])
+
+        d['xmacro']["BENCH_XMACRO%d" % i] = dict(members=[
+                [ "m%d" % j, "arg%d" % j ] for j in range(members) ])
+
+        d['flags']["bench_flags%d" % i] = dict(members=[
+                { "f%d" % j : dict(doc="flag %d" % j) }
+                for j in range(min(members, 31)) ])
+
+        d['aim_custom_log_macro']["bench_log%d" % i] = dict(
+            prefix="BENCH_LOG%d_FLAG_" % i,
+            flags=[ "f%d" % j for j in range(members) ])
+
+    d['cdefs']['BENCH_CONFIG_HEADER'] = dict(
+        basename="bench_config",
+        defs=[ { "BENCH_CONFIG_SETTING%d" % j : dict(default=j, doc="setting %d" % j) }
+               for j in range(enums * members) ])
+
+    return dict(definitions=d)
+
+
+def SyntheticSource():
+    """ Returns a source file containing every benchmark directive """
+    s = ""
+    for expr in DIRECTIVES:
+        s += "/* <auto.start.%s> */\n/* <auto.end.%s> */\n\n" % (expr, expr)
+    return s
+
+
+def Measure(bench, defs, source, repeat):
+    """ Runs a single benchmark. Returns (seconds, peak KB, bytes) """
+    import sourcegen
+    import cobjectgen
+    import cm
+
+    base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    best = None
+    size = 0
+
+    for r in range(repeat):
+        start = timeit.default_timer()
+        if bench == "cm.import":
+            cman = cm.ConfigManager()
+            cman.Import(defs)
+            size = os.path.getsize(defs)
+        elif bench == "sg.generate":
+            cman = cm.ConfigManager()
+            cman.Import(defs)
+            sg = sourcegen.SourceGenerator(cman,
+                                           cobjectgen.CObjectFactory(cman))
+            out = source + ".out"
+            sg.Generate(source, out)
+            size = os.path.getsize(out)
+        else:
+            if r == 0:
+                cman = cm.ConfigManager()
+                cman.Import(defs)
+                factory = cobjectgen.CObjectFactory(cman)
+                start = timeit.default_timer()
+            # Older revisions have no eval cache to clear.
+            if hasattr(factory, 'ClearEvalCache'):
+                factory.ClearEvalCache()
+            size = len(factory.Eval(bench[len("eval."):]))
+        elapsed = timeit.default_timer() - start
+        if best is None or elapsed < best:
+            best = elapsed
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - base
+    return (best, peak, size)
+
+
+def _poolMeasure(args):
+    return Measure(*args)
+
+
+def Run(enums, members, repeat):
+    """ Runs all benchmarks at one scale. Returns a result dict """
+    tmpdir = tempfile.mkdtemp(prefix="sgbench")
+    try:
+        defs = os.path.join(tmpdir, "bench.yml")
+        with open(defs, "w") as f:
+            yaml.safe_dump(SyntheticDefinitions(enums, members), f)
+        source = os.path.join(tmpdir, "bench.c")
+        with open(source, "w") as f:
+            f.write(SyntheticSource())
+
+        benches = ([ "cm.import" ] + [ "eval." + d for d in DIRECTIVES ] +
+                   [ "sg.generate" ])
+        results = {}
+        for bench in benches:
+            # A fresh process per benchmark keeps the peak RSS honest.
+            pool = multiprocessing.Pool(1)
+            try:
+                (seconds, peak, size) = pool.apply(_poolMeasure,
+                                                   ((bench, defs,
+                                                     source, repeat),))
+            finally:
+                pool.terminate()
+                pool.join()
+            results["%s@%dx%d" % (bench, enums, members)] = dict(
+                seconds=seconds, peak_kb=peak, bytes=size)
+        return results
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+def Revision():
+    try:
+        return subprocess.check_output(
+            [ "git", "rev-parse", "HEAD" ],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=open(os.devnull, "w")).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def Report(results, baseline=None):
+    regressions = 0
+    for name in sorted(results):
+        r = results[name]
+        line = "%-48s %10.4fs %8d KB %10d bytes" % (name, r['seconds'],
+                                                    r['peak_kb'], r['bytes'])
+        if baseline and name in baseline:
+            base = baseline[name]['seconds']
+            ratio = r['seconds'] / max(base, 1e-9)
+            line += "  %5.2fx" % ratio
+            # Sub-millisecond differences are timer noise.
+            if (ratio > 1 + gArgs.threshold / 100.0 and
+                r['seconds'] - base > 0.001):
+                line += "  REGRESSION"
+                regressions += 1
+        print line
+    return regressions
+
+
+if __name__ == "__main__":
+
+    ap = argparse.ArgumentParser(description="sgbench -- Source Generator Benchmarks")
+    ap.add_argument("-s", "--scale", nargs='+', default=[ "10x10", "50x50" ],
+                    help="Benchmark scales as ENUMSxMEMBERS.")
+    ap.add_argument("-r", "--repeat", type=int, default=5,
+                    help="Repeat each benchmark and keep the best time.")
+    ap.add_argument("-o", "--output",
+                    help="Save the results as a JSON baseline.")
+    ap.add_argument("--compare",
+                    help="Compare the results against a JSON baseline.")
+    ap.add_argument("--threshold", type=float, default=10.0,
+                    help="Slowdown percentage reported as a regression.")
+    gArgs = ap.parse_args()
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+    results = {}
+    for scale in gArgs.scale:
+        (enums, members) = [ int(x) for x in scale.split("x") ]
+        results.update(Run(enums, members, gArgs.repeat))
+
+    baseline = None
+    if gArgs.compare:
+        with open(gArgs.compare) as f:
+            baseline = json.load(f)['results']
+
+    regressions = Report(results, baseline)
+
+    if gArgs.output:
+        with open(gArgs.output, "w") as f:
+            json.dump(dict(revision=Revision(),
+                           python=sys.version.split()[0],
+                           repeat=gArgs.repeat,
+                           results=results), f, indent=2, sort_keys=True)
+            f.write("\n")
+
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,194 @@
+#!/usr/bin/python2
+#################################################################
+#
+#        Copyright 2013, Big Switch Networks, Inc.
+#
+# Licensed under the Eclipse Public License, Version 1.0 (the
+# "License"); you may not use this file except in compliance
+# with the License. You may obtain a copy of the License at
+#
+#        http://www.eclipse.org/legal/epl-v10.html
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific
+# language governing permissions and limitations under the
+# License.
+#
+#################################################################
+#
+# sgserver.py
+#
+# Persistent Source Generator server.
+#
+# The server keeps the object factory and all parsed definition
+# files in memory between requests made by 'sg.py --client'.
+# Each request and reply is a single line of JSON exchanged over
+# a local unix socket.
+#
+# Definition files are only reloaded when their mtime and contents
+# change. Changes to the generator modules themselves require a
+# server restart.
+#
+# Requests are served one at a time, and each one changes the
+# working directory of the whole process.
+#
+#################################################################
+
+import sourcegen
+import cobjectgen
+import argparse
+import traceback
+import StringIO
+import hashlib
+import socket
+import signal
+import json
+import sys
+import cm
+import os
+
+class SourceGenServer:
+    """ Serves sg.py generation requests from a warm process """
+
+    def __init__(self, path):
+        self.path = path
+        # Definition file cache. abspath -> [ mtime, digest, config ]
+        self.definitions = {}
+        self.factory = cobjectgen.CObjectFactory(cm.ConfigManager())
+        # Load every generator now so the fingerprint below describes
+        # the code this server runs.
+        for name in list(self.factory.lazyClasses):
+            self.factory.Class(name)
+        self.fingerprint = sourcegen.GeneratorFingerprint()
+
+    def Definition(self, fname):
+        """ Return the parsed config for a definition file """
+        fname = os.path.abspath(fname)
+        mtime = os.stat(fname).st_mtime
+        entry = self.definitions.get(fname)
+
+        if entry and entry[0] == mtime:
+            return entry[2]
+
+        data = open(fname).read()
+        digest = hashlib.sha1(data).hexdigest()
+        if entry and entry[1] == digest:
+            # Touched but not changed.
+            entry[0] = mtime
+            return entry[2]
+
+        c = cm.ConfigManager()
+        c.Import(fname)
+        self.definitions[fname] = [ mtime, digest, c.configs[0] ]
+        return c.configs[0]
+
+    def ConfigManager(self, defs):
+        """ Build a config manager from cached definition files """
+        cman = cm.ConfigManager()
+        for d in defs:
+            cman.AddConfig(self.Definition(str(d)))
+        return cman
+
+    def Handle(self, request):
+        """ Process a single generation request """
+        os.chdir(request['cwd'])
+        cman = self.ConfigManager(request.get('d') or [])
+        self.factory.cm = cman
+        self.factory.ClearEvalCache()
+
+        cache = None
+        warning = ""
+        if request.get('cache'):
+            if sourcegen.GeneratorFingerprint() != self.fingerprint:
+                # Output from the old code must not be stored under
+                # the new code's key.
+                warning = ("sgserver: the generator sources changed since"
+                           " the server started. Not using the cache."
+                           " Restart the server.\n")
+            else:
+                cache = sourcegen.GenerationCache(str(request['cache']),
+                                                  request.get('d'),
+                                                  request['cache_size']*1024*1024,
+                                                  self.fingerprint)
+
+        sg = sourcegen.SourceGenerator(cman, self.factory, cache)
+
+        stdout = sys.stdout
+        sys.stdout = StringIO.StringIO()
+        try:
+            files = [ str(inf) for inf in request.get('i') or []
+                      if os.path.isfile(inf) ]
+            of = request.get('o')
+            if of is None:
+                results = list(sg.GenerateList(files, request.get('j', 1)))
+            else:
+                results = []
+                for inf in files:
+                    # Matches the order of the local sg.py output.
+                    print "generate: %s:" % inf,
+                    results.append((inf, sg.Generate(inf, str(of))))
+            output = sys.stdout.getvalue()
+        finally:
+            sys.stdout = stdout
+
+        if cache:
+            cache.Prune()
+
+        return dict(results=results, stdout=output, warning=warning,
+                    written=sg.bytesWritten)
+
+    def Reply(self, conn):
+        f = conn.makefile('r')
+        try:
+            reply = self.Handle(json.loads(f.readline()))
+        except Exception, e:
+            reply = dict(error=traceback.format_exc())
+        conn.sendall(json.dumps(reply) + "\n")
+
+    def Serve(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+        s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # Requests write files as this user. Keep other users out,
+        # including between bind() and chmod().
+        umask = os.umask(0077)
+        try:
+            s.bind(self.path)
+        finally:
+            os.umask(umask)
+        os.chmod(self.path, 0600)
+        s.listen(16)
+        try:
+            while True:
+                (conn, address) = s.accept()
+                try:
+                    self.Reply(conn)
+                finally:
+                    conn.close()
+        finally:
+            s.close()
+            os.unlink(self.path)
+
+
+if __name__ == "__main__":
+
+    ap = argparse.ArgumentParser(description="sgserver -- Source Generator Server",
+                                 epilog="""Requests are handled one at a
+time, and each one changes the working directory of the whole server.
+Parallel clients, such as 'make -j' across modules, queue up behind
+each other. Use 'sg.py -j' to parallelize within a request.""")
+    ap.add_argument("socket", help="Path of the unix socket to listen on.")
+    ops = ap.parse_args()
+
+    # Remove the socket on SIGTERM as well as on ^C.
+    def terminate(signum, frame):
+        raise KeyboardInterrupt()
+    signal.signal(signal.SIGTERM, terminate)
+
+    try:
+        SourceGenServer(os.path.abspath(ops.socket)).Serve()
+    except KeyboardInterrupt:
+        pass
@@ -23,31 +23,197 @@
 #
 ##################################################################
 
+import multiprocessing
+import hashlib
+import signal
 import imp
 import sys
+import os
 import re
 import StringIO
 import tempfile
-import shutil
-import filecmp
+import stat
+import time
 import util
 import yaml
 
 class ParseError(Exception):
     def __init__(self, value):
+        # Keep the original argument so errors survive pickling
+        # back from generation worker processes.
+        Exception.__init__(self, value)
         self.value = "parse error: " + value
 
     def __str__(self):
         return str(self.value)
 
 
+def GeneratorFingerprint():
+    """ Digest of the generator module sources on disk """
+    dir_ = os.path.dirname(os.path.abspath(__file__))
+    h = hashlib.sha1()
+    for f in sorted(os.listdir(dir_)):
+        if f.endswith(".py") or f.endswith(".sopy"):
+            h.update(f)
+            h.update(open(os.path.join(dir_, f), 'rb').read())
+    return h.digest()
+
+# The generator sources this process runs, taken the first time it is needed.
+_processFingerprint = None
+
+
+class GenerationCache:
+    """ Content-addressed cache of in-place generation results.
+
+    Entries are keyed by the contents of the input file, the contents
+    of every definition file, and the source of the generator modules.
+    Each entry holds the generated output for its input. Prune() removes
+    the least recently used entries once the cache exceeds maxSize bytes.
+    """
+
+    def __init__(self, directory, definitions=None, maxSize=64*1024*1024,
+                 fingerprint=None):
+        self.directory = directory
+        self.maxSize = maxSize
+
+        if not os.path.isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError:
+                # Created concurrently
+                pass
+
+        h = hashlib.sha1(fingerprint or self.Fingerprint())
+        for d in definitions or []:
+            h.update(hashlib.sha1(open(d, 'rb').read()).digest())
+        self.context = h.digest()
+
+    def Fingerprint(self):
+        """ Digest of the generator module sources
+
+        Taken once per process, so a process keeps using the key of the
+        code it loaded even if the sources change while it runs. """
+        global _processFingerprint
+        if _processFingerprint is None:
+            _processFingerprint = GeneratorFingerprint()
+        return _processFingerprint
+
+    def Key(self, data):
+        return hashlib.sha1(self.context + data).hexdigest()
+
+    def Get(self, key):
+        """ Returns the cached output for key, or None """
+        path = os.path.join(self.directory, key)
+        try:
+            data = open(path, 'rb').read()
+            # Mark as recently used
+            os.utime(path, None)
+        except (IOError, OSError):
+            return None
+        return data
+
+    def Put(self, key, data):
+        f = tempfile.NamedTemporaryFile(dir=self.directory, delete=False)
+        f.write(data)
+        f.close()
+        os.rename(f.name, os.path.join(self.directory, key))
+
+    def Prune(self):
+        """ Evict least recently used entries beyond maxSize """
+        entries = []
+        total = 0
+        for f in os.listdir(self.directory):
+            path = os.path.join(self.directory, f)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            if not stat.S_ISREG(st.st_mode):
+                # The definition cache lives in a subdirectory.
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+
+        for (mtime, size, path) in sorted(entries):
+            if total <= self.maxSize:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+            total -= size
+
+
+# The generator used by worker processes in SourceGenerator.GenerateList().
+# It is set before the pool is created so forked workers share the
+# parent's parsed definitions instead of reloading them.
+_poolGenerator = None
+
+def _poolInit():
+    # Workers forked from sgserver would otherwise inherit its SIGTERM
+    # handler and print tracebacks when the pool is terminated.
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+def _poolGenerate(fileName):
+    of = _poolGenerator.of
+    (written, hits, misses) = (_poolGenerator.bytesWritten,
+                               of.evalHits, of.evalMisses)
+    diff = _poolGenerator.Generate(fileName, fileName)
+    return (diff, _poolGenerator.bytesWritten - written,
+            of.evalHits - hits, of.evalMisses - misses)
+
+
+class DirectiveProfile:
+    """ Wall time, object count and output size of each directive """
+
+    def __init__(self):
+        # (fileName, expr) -> [ calls, seconds, objects, bytes ]
+        self.records = {}
+
+    def Record(self, fileName, expr, seconds, objects, size):
+        r = self.records.setdefault((fileName, expr), [ 0, 0.0, 0, 0 ])
+        r[0] += 1
+        r[1] += seconds
+        r[2] += objects
+        r[3] += size
+
+    def Totals(self, index):
+        """ Aggregate the records by file (0) or by expression (1) """
+        totals = {}
+        for (key, r) in self.records.iteritems():
+            t = totals.setdefault(key[index], [ 0, 0.0, 0, 0 ])
+            for i in range(len(r)):
+                t[i] += r[i]
+        return totals
+
+    def Report(self, out, top=10):
+        directives = dict(("%s: %s" % key, r)
+                          for (key, r) in self.records.iteritems())
+        for (title, totals) in [ ("directive", directives),
+                                 ("file", self.Totals(0)),
+                                 ("expression", self.Totals(1)) ]:
+            out.write("Top %d by %s:\n" % (top, title))
+            ranked = sorted(totals.iteritems(), key=lambda t: -t[1][1])
+            for (name, r) in ranked[:top]:
+                out.write("  %9.4fs %5d calls %7d objects %9d bytes  %s\n" %
+                          (r[1], r[0], r[2], r[3], name))
+            out.write("\n")
+
+
 class SourceGenerator:
     """ SourceGenerator class """
 
-    def __init__(self, cManager, objectFactory):
+    def __init__(self, cManager, objectFactory, cache=None, profile=None):
 
         self.cm = cManager
         self.of = objectFactory
+        self.cache = cache
+        # Optional DirectiveProfile
+        self.profile = profile
+        self.fileName = None
+        # Bytes written to output files
+        self.bytesWritten = 0
 
         self.directiveS = re.compile(
             r'(.*)<auto.start.(?P<expr>.*)>')
@@ -60,72 +226,142 @@ class SourceGenerator:
 
     def Generate(self, inputFileName, outputFileName=None):
 
-        # Input File
-        self.inputFile = open(inputFileName)
+        self.fileName = inputFileName
+        data = open(inputFileName, 'rb').read()
+        replace = (outputFileName == inputFileName)
+
+        key = None
+        output = None
+        if self.cache and replace:
+            key = self.cache.Key(data)
+            output = self.cache.Get(key)
 
-        replace = False
+        if output is None:
+            output = self.Process(data)
+            if key:
+                self.cache.Put(key, output)
 
-        # Output File
         if outputFileName is None or outputFileName in [ 'stdout', '-' ]:
-            self.outputFile = sys.stdout
-            self.outputFileName = 'stdout'
-        elif outputFileName == inputFileName:
-            # In place. Generate to tmpfile and check results
-            self.outputFile = tempfile.NamedTemporaryFile()
-            replace = True
-            self.outputFileName = self.outputFile.name
+            sys.stdout.write(output)
+            sys.stdout.flush()
+            return False
+
+        diff = (output != data)
+
+        if replace:
+            if diff:
+                self.Replace(inputFileName, output)
         else:
             # Output file specified
-            self.outputFile = open(outputFileName, "w")
-            self.outputFileName = outputFileName
-            replace = False
-
-        # Process input file
-        for line in self.inputFile:
-            self.prn(line)
-
-            if self.StartDirective(line):
-                # Output code section
-                self.HandleDirective(line)
-                # Skip until the terminating directive
-                while not self.EndDirective(line):
-                    # Skip existing
-                    try:
-                        line = next(self.inputFile)
-                    except StopIteration:
-                        # End of file without finding terminator.
-                        raise ParseError(
-                            ('End of input while searching for '
-                             'the following terminator: '
-                             'auto.end.%s' % self.matchD.group('expr')))
-
-                self.prn(line)
-
-
-        diff = False
-        self.outputFile.flush()
-
-        if self.outputFileName != 'stdout':
-            #
-            # Diff results here
-            #
-            if filecmp.cmp(inputFileName, self.outputFileName):
-                # Files are the same
-                diff = False
-            else:
-                diff = True
-
-
-        if diff and replace:
-            self.inputFile.close()
-            shutil.copyfile(self.outputFileName, inputFileName)
-
-        if self.outputFile is not sys.stdout:
-            self.outputFile.close()
+            with open(outputFileName, "w") as f:
+                f.write(output)
+            self.bytesWritten += len(output)
 
         return diff
 
 
+    def Process(self, data):
+        """ Returns the generated output for the given input text """
+
+        self.outputFile = StringIO.StringIO()
+
+        # Process input file. Only lines containing an '<auto' marker
+        # can hold directives. Everything between them is copied in bulk.
+        pos = 0
+        mark = data.find('<auto')
+        while mark >= 0:
+            (start, end) = self.LineSpan(data, mark)
+            if not self.StartDirective(data[start:end]):
+                mark = data.find('<auto', end)
+                continue
+
+            self.prn(data[pos:end])
+            # Output code section
+            self.HandleDirective(data[start:end])
+
+            # Skip until the terminating directive. As with the start
+            # directive, this begins with the start line itself.
+            mark = start
+            while True:
+                mark = data.find('<auto', mark)
+                if mark < 0:
+                    # End of file without finding terminator.
+                    raise ParseError(
+                        ('End of input while searching for '
+                         'the following terminator: '
+                         'auto.end.%s' % self.matchD.group('expr')))
+                (start, end) = self.LineSpan(data, mark)
+                if self.EndDirective(data[start:end]):
+                    break
+                mark = end
+
+            self.prn(data[start:end])
+            pos = end
+            mark = data.find('<auto', end)
+
+        self.prn(data[pos:])
+
+        return self.outputFile.getvalue()
+
+
+    def Replace(self, fileName, data):
+        """ Atomically replace the contents of fileName """
+        # Write through symlinks rather than replacing them.
+        fileName = os.path.realpath(fileName)
+        dir_ = os.path.dirname(fileName)
+        f = tempfile.NamedTemporaryFile(dir=dir_, delete=False)
+        try:
+            f.write(data)
+            f.close()
+            os.chmod(f.name, stat.S_IMODE(os.stat(fileName).st_mode))
+            os.rename(f.name, fileName)
+        except:
+            os.unlink(f.name)
+            raise
+        self.bytesWritten += len(data)
+
+
+    def GenerateList(self, fileNames, jobs=1):
+        """ Generate a list of files in place.
+
+        Yields (fileName, diff) tuples in input order. If jobs is greater
+        than one the files are spread across that many worker processes."""
+
+        global _poolGenerator
+
+        # Profiles are only collected in this process.
+        if jobs <= 1 or len(fileNames) <= 1 or self.profile:
+            for fileName in fileNames:
+                yield (fileName, self.Generate(fileName, fileName))
+            return
+
+        _poolGenerator = self
+        pool = multiprocessing.Pool(min(jobs, len(fileNames)), _poolInit)
+        try:
+            for (i, (diff, written, hits, misses)) in enumerate(
+                pool.imap(_poolGenerate, fileNames)):
+                self.bytesWritten += written
+                # Eval cache statistics are collected in the workers.
+                self.of.evalHits += hits
+                self.of.evalMisses += misses
+                yield (fileNames[i], diff)
+        finally:
+            pool.terminate()
+            pool.join()
+            _poolGenerator = None
+
+
+    def LineSpan(self, data, offset):
+        """ Returns the (start, end) offsets of the line containing offset.
+        The end offset includes the newline. """
+        start = data.rfind('\n', 0, offset) + 1
+        end = data.find('\n', offset)
+        if end < 0:
+            end = len(data)
+        else:
+            end += 1
+        return (start, end)
+
     def StartDirective(self, line):
         self.matchD = self.directiveS.match(line);
         return self.matchD
@@ -140,5 +376,13 @@ class SourceGenerator:
 
     def HandleDirective(self, line):
         expr = self.matchD.group('expr')
+        if self.profile is None:
+            self.prn(self.of.Eval(expr))
+            return
+
+        objects = self.of.objectsCreated
+        start = time.time()
         x = self.of.Eval(expr)
+        self.profile.Record(self.fileName, expr, time.time() - start,
+                            self.of.objectsCreated - objects, len(x))
         self.prn(x)
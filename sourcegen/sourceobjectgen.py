@@ -23,11 +23,27 @@
 # Base class for object generation (any language)
 #
 #################################################################
+import inspect
 import util
 import sys
 import cm
 import re
 
+class SourceEmitter:
+    """ Output sink for generated source.
+
+    Generators write fragments with write() as they produce them.
+    The fragments are joined only once, by getvalue(). Any object with
+    a write() method, such as an open file, can be used instead. """
+
+    def __init__(self):
+        self.parts = []
+        self.write = self.parts.append
+
+    def getvalue(self):
+        return "".join(self.parts)
+
+
 class SourceObjectGenerator:
     """ Subclass Object Generator """
 
@@ -107,6 +123,14 @@ class SourceObjectGenerator:
         return True
 
 
+    def Emitted(self, emit, *args):
+        """ Returns the output of an Emit* generation method as a string.
+        The string-returning generation methods are wrappers around this. """
+        out = SourceEmitter()
+        emit(out, *args)
+        return out.getvalue()
+
+
     def NormalizeData(self, data):
         """ Normalize our user-defined data definition to the
         object-cannonical format. Allows the user to specify a variety
@@ -118,6 +142,8 @@ class SourceObjectGenerator:
 
 
 
+import tempfile
+import json
 import cm
 import sys
 import imp
@@ -145,8 +171,18 @@ class SourceObjectFactory:
         self.modules = []
         self.classes = {}
         self.objectTypes = {}
+        # Registered classes whose modules have not been imported yet.
+        # class name -> module name
+        self.lazyClasses = {}
         self.cm = configManager
 
+        # Eval() results, keyed by definition snapshot and expression
+        self.ClearEvalCache()
+        # Emit* method names, keyed by class and generation method
+        self.emitMethods = {}
+        # Objects created by CreateObjectList()
+        self.objectsCreated = 0
+
         if LoadLocal:
             # Load all modules in our local directory
             self.ImportModules(
@@ -171,13 +207,94 @@ class SourceObjectFactory:
 
             return False
 
+    # Generator registry file maintained in each module directory
+    registryName = ".sgregistry"
+
+    def __registryStamp(self, dir_):
+        """ Returns the mtimes of all candidate generator modules """
+        stamp = {}
+        for f in os.listdir(dir_):
+            if f.endswith(".py") or f.endswith(".sopy"):
+                stamp[f] = os.stat(os.path.join(dir_, f)).st_mtime
+        return stamp
+
+    def __loadRegistry(self, dir_, stamp):
+        try:
+            registry = json.load(open(os.path.join(dir_, self.registryName)))
+        except (IOError, ValueError):
+            return None
+        if registry.get('stamp') != stamp:
+            return None
+        return registry
+
+    def __buildRegistry(self, dir_, stamp):
+        """ Import all modules in a given directory and record the
+        generator classes they provide """
+        classes = self.classes
+        objectTypes = self.objectTypes
+        self.classes = {}
+        self.objectTypes = {}
+        try:
+            registry = dict(stamp=stamp, classes={},
+                            objectTypes=self.objectTypes)
+            for f in os.listdir(dir_):
+                m = self.__isSourceObjectModule(dir_, f)
+                if m:
+                    self.ImportModule(m)
+                    for (name, cls) in self.classes.iteritems():
+                        if getattr(self.modules[-1], name, None) is cls:
+                            registry['classes'][name] = m
+
+            # Prefer the module which defines each class so first use
+            # imports as little as possible.
+            for (name, cls) in self.classes.iteritems():
+                if getattr(sys.modules.get(cls.__module__), name, None) is cls:
+                    registry['classes'][name] = cls.__module__
+            classes.update(self.classes)
+            objectTypes.update(self.objectTypes)
+        finally:
+            self.classes = classes
+            self.objectTypes = objectTypes
+
+        # Persist for the next run. Failure just means a rebuild next time.
+        try:
+            f = tempfile.NamedTemporaryFile(dir=dir_, delete=False)
+            json.dump(registry, f)
+            f.close()
+            os.chmod(f.name, 0644)
+            os.rename(f.name, os.path.join(dir_, self.registryName))
+        except (IOError, OSError):
+            pass
+
+        return registry
+
     def ImportModules(self, dir_):
-        """Import all modules in a given directory """
+        """Register all modules in a given directory.
+
+        The generator classes are read from the directory's registry
+        when it is current, and their modules are imported on first use.
+        Otherwise all modules are imported and the registry is rebuilt."""
+        dir_ = os.path.abspath(dir_)
         sys.path.append(dir_)
-        for f in os.listdir(os.path.abspath(dir_)):
-            m = self.__isSourceObjectModule(dir_, f)
-            if m:
-                self.ImportModule(m)
+        stamp = self.__registryStamp(dir_)
+        registry = self.__loadRegistry(dir_, stamp)
+        if registry is None:
+            self.__buildRegistry(dir_, stamp)
+            return
+
+        for (name, mod) in registry['classes'].iteritems():
+            self.classes.pop(str(name), None)
+            self.lazyClasses[str(name)] = str(mod)
+        for (ot, name) in registry['objectTypes'].iteritems():
+            self.objectTypes[str(ot)] = str(name)
+
+    def Class(self, name):
+        """ Returns the generator class with the given name """
+        if name not in self.classes:
+            mod = self.lazyClasses.pop(name)
+            self.modules.append(__import__(mod))
+            self.classes[name] = getattr(self.modules[-1], name)
+        return self.classes[name]
 
     def ImportModule(self, mod):
         """Import a module name """
@@ -198,6 +315,8 @@ class SourceObjectFactory:
 
 
     def ListClasses(self):
+        for clsname in self.lazyClasses.keys():
+            self.Class(clsname)
         for clsname, cls in self.classes.iteritems():
             print "%s:%s (type=%s)" % (clsname, cls, cls.objectType)
 
@@ -206,7 +325,7 @@ class SourceObjectFactory:
         objectClass = None
         objectList = []
 
-        if cls in self.classes:
+        if cls in self.classes or cls in self.lazyClasses:
             # Requested by name
             objectClass = cls
         if cls in self.objectTypes:
@@ -218,7 +337,7 @@ class SourceObjectFactory:
                 # Get the list of specific object names to which
                 # the requested name may refer:
                 nameList = self.cm.ObjectNameList(
-                    self.classes[objectClass].objectType,
+                    self.Class(objectClass).objectType,
                     name)
 
                 # if nameList is empty, we couldn't resolve the symbol
@@ -228,21 +347,55 @@ class SourceObjectFactory:
 
                 # Create all named objects
                 for name in nameList:
-                    obj = self.classes[objectClass](name=name, cm=self.cm)
+                    obj = self.Class(objectClass)(name=name, cm=self.cm)
                     obj.objectFactory = self
                     objectList.append(obj)
 
             else:
                 # Name is empty
-                obj = self.classes[objectClass](name=None)
+                obj = self.Class(objectClass)(name=None)
                 obj.objectFactory = self
                 objectList.append(obj)
 
+            self.objectsCreated += len(objectList)
             return objectList
 
         raise Exception("Could not create object type '%s'" % cls)
 
 
+    def __emitMethod(self, obj, method):
+        """ Returns the name of the Emit* method which streams the output
+        of the given generation method, if the object has one.
+
+        The Emit* method is only used if it is not overridden by a
+        subclass which overrides the string method itself. """
+        key = (obj.__class__, method.lower())
+        if key in self.emitMethods:
+            return self.emitMethods[key]
+
+        names = dict((name.lower(), name) for name in reversed(dir(obj)))
+        emit = None
+        if method.lower() in names and "emit" + method.lower() in names:
+            mro = inspect.getmro(obj.__class__)
+            def definer(name):
+                for c in mro:
+                    if name in c.__dict__:
+                        return c
+            emitClass = definer(names["emit" + method.lower()])
+            methodClass = definer(names[method.lower()])
+            if emitClass and methodClass and issubclass(emitClass, methodClass):
+                emit = names["emit" + method.lower()]
+
+        self.emitMethods[key] = emit
+        return emit
+
+    def __emitObjectMethod(self, obj, method, out):
+        emit = self.__emitMethod(obj, method)
+        if emit:
+            getattr(obj, emit)(out)
+        else:
+            out.write(self.__callObjectMethod(obj, method, True))
+
     def __callObjectMethod(self, obj, method, raise_=True):
         #
         # Syntactic sugar
@@ -282,8 +435,42 @@ class SourceObjectFactory:
 
         raise Exception("Could not eval '%s'" % expr)
 
+    def ClearEvalCache(self):
+        self.evalCache = {}
+        self.evalHits = 0
+        self.evalMisses = 0
+
+    def EvalCacheStats(self):
+        return "eval cache: %d hits, %d misses, %d entries" % (
+            self.evalHits, self.evalMisses, len(self.evalCache))
+
+    def EvalEmit(self, expr, out):
+        """ Evaluate an expression, writing the output to 'out' """
+
+        for r in self.methodReList:
+            x = r.match(expr)
+            if x:
+                # Method invocation. Stream the output of each object.
+                objList = self.CreateObjectList(x.group('cls'),
+                                                x.group('name'))
+                for (i, obj) in enumerate(objList):
+                    if i:
+                        out.write("\n")
+                    self.__emitObjectMethod(obj, x.group('method'), out)
+                return
+
+        out.write("\n".join(self.EvalList(expr)))
+
     def Eval(self, expr):
-        return "\n".join(self.EvalList(expr))
+        key = (getattr(self.cm, 'snapshot', None), expr)
+        if key in self.evalCache:
+            self.evalHits += 1
+        else:
+            self.evalMisses += 1
+            out = SourceEmitter()
+            self.EvalEmit(expr, out)
+            self.evalCache[key] = out.getvalue()
+        return self.evalCache[key]
 
 
 
@@ -85,14 +85,24 @@ def ifndef(def_, val):
 
 
 class DotDict(dict):
-    """ Access keys in a nested dictionary using dot notation """
+    """ Access keys in a nested dictionary using dot notation
+
+    Nested dicts are replaced with DotDicts the first time they are
+    accessed as attributes, so repeated access does not allocate. """
+
+    __slots__ = ()
 
     def __getattr__(self, attr):
         item = self.get(attr, None)
         if type(item) == types.DictType:
             item = DotDict(item)
+            dict.__setitem__(self, attr, item)
         return item
 
     __setattr__= dict.__setitem__
     __delattr__= dict.__delitem__
 
+    def __reduce__(self):
+        # __getattr__ would answer pickle's special method lookups.
+        return (DotDict, (dict(self),))
+